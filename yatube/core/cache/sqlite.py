@@ -0,0 +1,294 @@
+"""Общий для процессов кэш в файле SQLite в режиме WAL."""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Предел числа параметров в одном запросе SQLite.
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entry_accessed_idx
+    ON cache_entry (accessed);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_entry_insert
+    AFTER INSERT ON cache_entry
+    BEGIN UPDATE cache_size SET total = total + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_update
+    AFTER UPDATE OF size ON cache_entry
+    BEGIN UPDATE cache_size SET total = total - OLD.size + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_delete
+    AFTER DELETE ON cache_entry
+    BEGIN UPDATE cache_size SET total = total - OLD.size; END;
+"""
+
+UPSERT = """
+INSERT INTO cache_entry (key, value, expires, accessed, size)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    expires = excluded.expires,
+    accessed = excluded.accessed,
+    size = excluded.size
+"""
+
+LIVE = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в одном файле SQLite, общий для всех процессов хоста.
+
+    Целые числа хранятся как INTEGER, поэтому incr выполняется одним
+    атомарным UPDATE. Размер записей ведут триггеры; когда он превышает
+    MAX_BYTES, вытесняются давно не читавшиеся записи. Время чтения
+    обновляется не чаще раза в TOUCH_INTERVAL секунд.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = os.path.abspath(location)
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._touch_interval = float(options.get('TOUCH_INTERVAL', 1))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        """Соединение своё у каждого потока и у каждого процесса."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _encode(self, value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value, 8
+        blob = pickle.dumps(value, self.pickle_protocol)
+        return blob, len(blob)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _row(self, key, value, timeout, now):
+        stored, size = self._encode(value)
+        expires = self.get_backend_timeout(timeout)
+        return key, stored, expires, now, size + len(key)
+
+    def _touch_read(self, keys, accessed, now):
+        stale = [
+            key for key in keys
+            if accessed[key] < now - self._touch_interval
+        ]
+        for start in range(0, len(stale), BATCH_SIZE):
+            batch = stale[start:start + BATCH_SIZE]
+            self._db.execute(
+                'UPDATE cache_entry SET accessed = ? WHERE key IN '
+                f'({", ".join("?" * len(batch))})',
+                [now, *batch],
+            )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        cursor = self._db.execute(
+            UPSERT + ' WHERE cache_entry.expires <= ?',
+            [*self._row(key, value, timeout, now), now],
+        )
+        self._cull()
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._get_many([key]).get(key, default)
+
+    def _get_many(self, keys):
+        now = time.time()
+        found = {}
+        accessed = {}
+        for start in range(0, len(keys), BATCH_SIZE):
+            batch = keys[start:start + BATCH_SIZE]
+            rows = self._db.execute(
+                'SELECT key, value, accessed FROM cache_entry WHERE key IN '
+                f'({", ".join("?" * len(batch))}) AND {LIVE}',
+                [*batch, now],
+            )
+            for key, value, last in rows:
+                found[key] = self._decode(value)
+                accessed[key] = last
+        self._touch_read(found, accessed, now)
+        return found
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_key(key, version=version): key for key in keys}
+        for key in keys:
+            self.validate_key(key)
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._db.execute(UPSERT, self._row(key, value, timeout, time.time()))
+        self._cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append(self._row(key, value, timeout, now))
+        with self._transaction() as db:
+            db.executemany(UPSERT, rows)
+        self._cull()
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        cursor = self._db.execute(
+            f'UPDATE cache_entry SET expires = ? WHERE key = ? AND {LIVE}',
+            [self.get_backend_timeout(timeout), key, now],
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._db.execute('DELETE FROM cache_entry WHERE key = ?', [key])
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        with self._transaction() as db:
+            for start in range(0, len(keys), BATCH_SIZE):
+                batch = keys[start:start + BATCH_SIZE]
+                db.execute(
+                    'DELETE FROM cache_entry WHERE key IN '
+                    f'({", ".join("?" * len(batch))})',
+                    batch,
+                )
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._db.execute(
+            f'SELECT 1 FROM cache_entry WHERE key = ? AND {LIVE}',
+            [key, time.time()],
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        row = self._db.execute(
+            'UPDATE cache_entry SET value = value + ?, accessed = ? '
+            f"WHERE key = ? AND typeof(value) = 'integer' AND {LIVE} "
+            'RETURNING value',
+            [delta, now, key, now],
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        with self._transaction() as db:
+            row = db.execute(
+                f'SELECT value FROM cache_entry WHERE key = ? AND {LIVE}',
+                [key, now],
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._decode(row[0]) + delta
+            stored, size = self._encode(value)
+            db.execute(
+                'UPDATE cache_entry SET value = ?, accessed = ?, size = ? '
+                'WHERE key = ?',
+                [stored, now, size + len(key), key],
+            )
+        return value
+
+    def clear(self):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache_entry')
+            db.execute('UPDATE cache_size SET total = 0')
+
+    def close(self, **kwargs):
+        """Соединение переживает запрос: открывать его заново дороже."""
+
+    def size(self) -> int:
+        """Суммарный размер записей в байтах."""
+        return self._db.execute(
+            'SELECT total FROM cache_size'
+        ).fetchone()[0]
+
+    def _cull(self):
+        """Вытесняет записи, пока размер не уйдёт ниже бюджета.
+
+        Сначала удаляются просроченные, затем давно не читавшиеся,
+        с запасом в 1 / CULL_FREQUENCY бюджета.
+        """
+        if self.size() <= self._max_bytes:
+            return
+        target = 0
+        if self._cull_frequency:
+            target = self._max_bytes - self._max_bytes // self._cull_frequency
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM cache_entry WHERE expires <= ?', [time.time()]
+            )
+            excess = db.execute(
+                'SELECT total - ? FROM cache_size', [target]
+            ).fetchone()[0]
+            if excess <= 0:
+                return
+            db.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                ' SELECT key FROM ('
+                '  SELECT key, size, SUM(size) OVER ('
+                '   ORDER BY accessed, key'
+                '  ) AS freed FROM cache_entry'
+                ' ) WHERE freed - size < ?'
+                ')',
+                [excess],
+            )
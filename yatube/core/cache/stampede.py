@@ -0,0 +1,92 @@
+"""Защита горячих ключей кэша от одновременного пересчёта."""
+import math
+import random
+import time
+from typing import Any, NamedTuple, Optional
+
+from django.core.cache import cache as default_cache
+
+LOCK_KEY = 'stampede_lock:{}'
+# Сколько держится блокировка, если пересчитывающий процесс упал.
+LOCK_TIMEOUT = 30
+# Сколько после логического истечения запись ещё отдаётся как устаревшая.
+STALE_TIMEOUT = 5 * 60
+POLL_INTERVAL = 0.05
+
+
+class Entry(NamedTuple):
+    value: Any
+    version: Any
+    expires: Optional[float]
+    delta: float
+
+
+def is_expiring(entry, now, beta: float) -> bool:
+    """Вероятностное раннее истечение (XFetch).
+
+    Чем дольше пересчёт и ближе срок, тем вероятнее, что запрос
+    возьмётся за него заранее, пока остальные читают свежее значение.
+    """
+    if entry.expires is None:
+        return False
+    return now - entry.delta * beta * math.log(random.random()) >= (
+        entry.expires
+    )
+
+
+def fetch(
+        key,
+        compute,
+        timeout: Optional[int],
+        version=None,
+        beta: float = 1.0,
+        cache=default_cache,
+):
+    """Значение ключа; пересчитывает его не больше одного процесса.
+
+    Истекшая запись той же версии отдаётся, пока блокировку держит
+    тот, кто пересчитывает. Запись другой версии не отдаётся: по
+    версии строится ETag страницы. Без подходящей записи ждут
+    результата, а если блокировку отпустили без него, берут её сами.
+    """
+    entry = cache.get(key)
+    if (
+        entry is not None
+        and entry.version == version
+        and not is_expiring(entry, time.time(), beta)
+    ):
+        return entry.value
+    stale = entry is not None and entry.version == version
+    lock = LOCK_KEY.format(key)
+    deadline = time.time() + LOCK_TIMEOUT
+    while time.time() < deadline:
+        if cache.add(lock, 1, LOCK_TIMEOUT):
+            try:
+                if not stale:
+                    # Прежний держатель мог успеть записать значение.
+                    entry = cache.get(key)
+                    if entry is not None and entry.version == version:
+                        return entry.value
+                return _recompute(key, compute, timeout, version, cache)
+            finally:
+                cache.delete(lock)
+        if stale:
+            return entry.value
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry.version == version:
+            return entry.value
+    return compute()
+
+
+def _recompute(key, compute, timeout, version, cache):
+    started = time.time()
+    value = compute()
+    now = time.time()
+    expires = None if timeout is None else now + timeout
+    cache.set(
+        key,
+        Entry(value, version, expires, now - started),
+        None if timeout is None else timeout + STALE_TIMEOUT,
+    )
+    return value
@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache.sqlite import SQLiteCache
+
+COUNTER_KEY = 'bench:counter'
+
+
+def run_worker(make_cache, options, seed, results):
+    """Чтение со сквозной записью на промахе и общий счётчик."""
+    cache = make_cache()
+    rng = random.Random(seed)
+    value = 'x' * options['value_size']
+    hits = 0
+    started = time.perf_counter()
+    for _ in range(options['operations']):
+        key = f'bench:{int(rng.paretovariate(1.2)) % options["keys"]}'
+        if cache.get(key) is None:
+            cache.set(key, value, None)
+        else:
+            hits += 1
+        cache.incr(COUNTER_KEY)
+    results.put((hits, time.perf_counter() - started))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает LocMemCache и общий SQLiteCache под нагрузкой '
+        'из нескольких процессов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--value-size', type=int, default=1024)
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                'locmem': lambda: LocMemCache('bench', {}),
+                'sqlite': lambda: SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'), {}
+                ),
+            }
+            self.stdout.write(
+                f'{"кэш":>8} {"оп/с":>10} {"попадания":>10} '
+                f'{"счётчик":>10} {"ожидалось":>10}'
+            )
+            for name, make_cache in backends.items():
+                self.measure(name, make_cache, context, options)
+
+    def measure(self, name, make_cache, context, options):
+        cache = make_cache()
+        cache.clear()
+        cache.set(COUNTER_KEY, 0, None)
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(make_cache, options, seed, results),
+            )
+            for seed in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        finished = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        operations = options['operations'] * options['processes']
+        hits = sum(hits for hits, _ in finished)
+        elapsed = max(seconds for _, seconds in finished)
+        self.stdout.write(
+            f'{name:>8} {operations * 2 / elapsed:>10.0f} '
+            f'{hits / operations:>10.1%} {cache.get(COUNTER_KEY):>10} '
+            f'{operations:>10}'
+        )
@@ -0,0 +1,45 @@
+"""Хранилище, называющее файлы по хэшу содержимого."""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+def content_hash(content) -> str:
+    """sha256 файла, прочитанного порциями, без загрузки в память."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Одинаковые загрузки хранятся одним файлом.
+
+    Файл называется хэшем содержимого в каталоге из upload_to, поэтому
+    повторная загрузка получает имя уже сохранённой копии, а миниатюры
+    sorl, чьи имена выводятся из имени исходника, становятся общими.
+    Файлы не удаляются при удалении поста: на них могут ссылаться другие.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Свежее время изменения бережёт файл от gc_media, пока
+            # пост с этим именем не закоммичен.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def content_name(self, name, content) -> str:
+        """Имя вида posts/ab/abcdef….jpg по хэшу содержимого."""
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        return os.path.join(directory, digest[:2], digest + extension)
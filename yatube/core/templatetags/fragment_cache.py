@@ -0,0 +1,49 @@
+from django import template
+from django.conf import settings
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache.stampede import fetch
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, name, vary_on, version):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        key = make_template_fragment_key(
+            self.name, [var.resolve(context) for var in self.vary_on]
+        )
+        return fetch(
+            key,
+            lambda: self.nodelist.render(context),
+            settings.FRAGMENT_TIMEOUT,
+            version=self.version.resolve(context),
+        )
+
+
+@register.tag
+def fragment_cache(parser, token):
+    """Кэширует фрагмент с защитой от одновременного пересчёта.
+
+    {% fragment_cache name [var1 var2 ...] version=expr %}
+    Истекший фрагмент той же версии отдаётся, пока новый отрисовывает
+    другой запрос; фрагмент другой версии не отдаётся никогда.
+    """
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3 or not bits[-1].startswith('version='):
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} ожидает имя фрагмента и version=…'
+        )
+    return FragmentCacheNode(
+        nodelist,
+        bits[1],
+        [parser.compile_filter(bit) for bit in bits[2:-1]],
+        parser.compile_filter(bits[-1][len('version='):]),
+    )
@@ -1,5 +1,19 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.test import Client, SimpleTestCase, TestCase
+
+from core.cache.sqlite import SQLiteCache
+from core.cache.stampede import LOCK_KEY, Entry, fetch
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -17,3 +31,172 @@ class ErrorPagesURLTests(TestCase):
             with self.subTest(address=address):
                 response = self.guest_user.get(address)
                 self.assertTemplateUsed(response, template)
+
+
+def increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_BYTES': 1000, 'TOUCH_INTERVAL': 0},
+        })
+
+    def test_values_round_trip(self):
+        """Значения читаются такими же, какими записаны."""
+        values = {'int': 7, 'flag': True, 'text': 'пост', 'list': [1, 'a']}
+        self.cache.set_many(values)
+        self.assertEqual(self.cache.get_many([*values, 'missing']), values)
+        self.cache.delete_many(['int', 'flag'])
+        self.assertIsNone(self.cache.get('int'))
+        self.assertEqual(self.cache.get('text'), 'пост')
+
+    def test_expired_values_are_missing(self):
+        self.cache.set('key', 'value', -1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'newer'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic_across_processes(self):
+        """Приращения из нескольких процессов не теряются."""
+        self.cache.set('counter', 0, None)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.location, 200))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 800)
+
+    def test_processes_share_values(self):
+        other = SQLiteCache(self.location, {})
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+
+    def test_least_recently_read_evicted_over_budget(self):
+        """При превышении бюджета вытесняются давно не читавшиеся."""
+        for key in ('first', 'second', 'third'):
+            self.cache.set(key, 'x' * 200)
+        self.cache.get('first')
+        self.cache.set('fourth', 'x' * 400)
+        self.assertLessEqual(self.cache.size(), 1000)
+        self.assertIsNotNone(self.cache.get('first'))
+        self.assertIsNone(self.cache.get('second'))
+        self.assertIsNotNone(self.cache.get('fourth'))
+
+
+class StampedeTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache('stampede-tests', {})
+        self.cache.clear()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def compute(self):
+        with self.lock:
+            self.calls += 1
+            value = self.calls
+        time.sleep(0.2)
+        return value
+
+    def fetch_together(self, workers=8, version=None, timeout=60):
+        barrier = threading.Barrier(workers)
+
+        def work():
+            barrier.wait()
+            return fetch(
+                'key', self.compute, timeout, version, cache=self.cache
+            )
+
+        with ThreadPoolExecutor(workers) as pool:
+            futures = [pool.submit(work) for _ in range(workers)]
+            return [future.result() for future in futures]
+
+    def test_single_recomputation_on_miss(self):
+        """Без значения считает один поток, остальные ждут его."""
+        self.assertEqual(self.fetch_together(), [1] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_single_recomputation_per_expiry(self):
+        """После истечения считает один поток, остальные берут старое."""
+        self.cache.set('key', Entry('old', None, time.time() - 1, 0))
+        results = self.fetch_together()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(results, key=str), [1] + ['old'] * 7)
+        self.assertEqual(self.fetch_together(), [1] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_new_version_waits_for_recomputation(self):
+        """Запись прошлой версии не отдаётся: все ждут новую."""
+        self.fetch_together(version=1)
+        results = self.fetch_together(version=2)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(results, [2] * 8)
+
+    def test_waiter_takes_released_lock(self):
+        """Упавший держатель блокировки не заставляет ждать LOCK_TIMEOUT."""
+        lock = LOCK_KEY.format('key')
+        self.cache.add(lock, 1)
+        threading.Timer(0.1, self.cache.delete, [lock]).start()
+        started = time.time()
+        value = fetch('key', self.compute, 60, cache=self.cache)
+        self.assertEqual(value, 1)
+        self.assertLess(time.time() - started, 1)
+
+    def test_early_expiry(self):
+        """Долгий пересчёт у срока истечения начинается заранее."""
+        self.cache.set('key', Entry('old', None, time.time() + 1, 1000))
+        value = fetch('key', self.compute, 60, cache=self.cache)
+        self.assertEqual(value, 1)
+        self.cache.set('key', Entry('old', None, time.time() + 1, 0))
+        value = fetch('key', self.compute, 60, cache=self.cache)
+        self.assertEqual(value, 'old')
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = ContentAddressedStorage(location=directory.name)
+
+    def test_identical_uploads_stored_once(self):
+        first = self.storage.save('posts/cat.JPG', ContentFile(b'meme'))
+        second = self.storage.save('posts/copy.jpg', ContentFile(b'meme'))
+        digest = hashlib.sha256(b'meme').hexdigest()
+        self.assertEqual(first, f'posts/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(second, first)
+        self.assertEqual(
+            os.listdir(self.storage.path(f'posts/{digest[:2]}')),
+            [f'{digest}.jpg'],
+        )
+
+    def test_identical_upload_touches_file(self):
+        """Повторная загрузка обновляет время изменения для gc_media."""
+        name = self.storage.save('posts/cat.jpg', ContentFile(b'meme'))
+        os.utime(self.storage.path(name), (0, 0))
+        self.storage.save('posts/copy.jpg', ContentFile(b'meme'))
+        self.assertGreater(
+            os.path.getmtime(self.storage.path(name)), time.time() - 60
+        )
+
+    def test_different_content_different_names(self):
+        self.assertNotEqual(
+            self.storage.save('posts/a.jpg', ContentFile(b'first')),
+            self.storage.save('posts/a.jpg', ContentFile(b'second')),
+        )
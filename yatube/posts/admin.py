@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Group, Post
+from .search import match_expression, matching_ids
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -14,8 +15,21 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
+    readonly_fields = (
+        'image_width',
+        'image_height',
+        'image_format',
+        'image_size',
+    )
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по индексу FTS5 вместо LIKE по тексту."""
+        match = match_expression(search_term)
+        if not match:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(match)), False
+
 
 admin.site.register(Post, PostAdmin)
 
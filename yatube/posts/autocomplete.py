@@ -0,0 +1,165 @@
+"""Автодополнение по префиксу: отсортированный индекс в памяти процесса."""
+import bisect
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from .models import Group
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+
+class PrefixIndex:
+    """Отсортированный список (ключ, id); поиск по префиксу — bisect.
+
+    Строится при первом запросе и дальше правится по сигналам сохранения.
+    Сигналы доходят только до своего процесса, поэтому индекс целиком
+    перестраивается раз в AUTOCOMPLETE_REFRESH секунд: в фоне и одним
+    потоком, а поиск тем временем идёт по старому.
+    """
+
+    def __init__(self, load):
+        self.load = load
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.built = None
+        # Правки, пришедшие во время load(): (id, подпись или None, ключи).
+        self.pending = None
+        self.entries = []
+        self.labels = {}
+
+    def build(self):
+        """Собирает индекс заново.
+
+        Правки, пришедшие за время load(), повторяются поверх нового списка.
+        """
+        with self.lock:
+            self.pending = []
+        try:
+            entries = []
+            labels = {}
+            for pk, label, keys in self.load():
+                labels[pk] = (label, keys)
+                entries.extend((key, pk) for key in keys)
+            entries.sort()
+        except BaseException:
+            with self.lock:
+                self.pending = None
+            raise
+        with self.lock:
+            self.entries, self.labels = entries, labels
+            for pk, label, keys in self.pending:
+                self._remove(pk)
+                if label is not None:
+                    self._insert(pk, label, keys)
+            self.pending = None
+            self.built = time.monotonic()
+
+    def reset(self):
+        """Забывает индекс: следующий поиск соберёт его заново."""
+        with self.lock:
+            self.built = None
+            self.entries, self.labels = [], {}
+
+    def ensure_built(self):
+        """Первую сборку ждут все, устаревший индекс обновляет фон."""
+        if self.built is None:
+            with self.build_lock:
+                if self.built is None:
+                    self.build()
+        elif (
+            time.monotonic() - self.built > settings.AUTOCOMPLETE_REFRESH
+            and self.build_lock.acquire(blocking=False)
+        ):
+            threading.Thread(
+                target=self._refresh, name='autocomplete', daemon=True
+            ).start()
+
+    def _refresh(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Не удалось перестроить автодополнение')
+        finally:
+            self.build_lock.release()
+            connection.close()
+
+    def update(self, pk, label, keys):
+        """Заменяет ключи объекта; до первой сборки только запоминает."""
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((pk, label, keys))
+            if self.built is None:
+                return
+            self._remove(pk)
+            self._insert(pk, label, keys)
+
+    def remove(self, pk):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((pk, None, ()))
+            self._remove(pk)
+
+    def _insert(self, pk, label, keys):
+        self.labels[pk] = (label, keys)
+        for key in keys:
+            bisect.insort(self.entries, (key, pk))
+
+    def _remove(self, pk):
+        _, keys = self.labels.pop(pk, (None, ()))
+        for key in keys:
+            index = bisect.bisect_left(self.entries, (key, pk))
+            if index < len(self.entries) and self.entries[index] == (key, pk):
+                del self.entries[index]
+
+    def search(self, prefix, limit) -> list:
+        """До limit пар (id, подпись), чьи ключи начинаются с prefix."""
+        prefix = prefix.casefold()
+        if not prefix:
+            return []
+        self.ensure_built()
+        found = {}
+        with self.lock:
+            index = bisect.bisect_left(self.entries, (prefix,))
+            while index < len(self.entries) and len(found) < limit:
+                key, pk = self.entries[index]
+                if not key.startswith(prefix):
+                    break
+                found.setdefault(pk, self.labels[pk][0])
+                index += 1
+        return list(found.items())
+
+
+def user_keys(username) -> tuple:
+    return (username.casefold(),)
+
+
+def group_keys(title, slug) -> tuple:
+    """Слаг, название и каждое слово названия."""
+    words = title.casefold().split()
+    return tuple(sorted({slug.casefold(), title.casefold(), *words}))
+
+
+def load_users():
+    for pk, username in User.objects.values_list(
+        'pk', 'username'
+    ).iterator():
+        yield pk, username, user_keys(username)
+
+
+def load_groups():
+    for pk, title, slug in Group.objects.values_list(
+        'pk', 'title', 'slug'
+    ).iterator():
+        yield pk, title, group_keys(title, slug)
+
+
+INDEXES = {
+    'users': PrefixIndex(load_users),
+    'groups': PrefixIndex(load_groups),
+}
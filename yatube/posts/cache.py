@@ -0,0 +1,116 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+FEED_COUNT_KEY = 'feed_count:{}'
+GENERATION_KEY = 'generation:{}'
+POST_FRAGMENT_KEY = 'post_fragment:{}:{}'
+IDENTITY_KEY = 'identity:{}:{}:{}'
+# Отрицательная запись: объекта с таким значением поля нет.
+MISSING = 0
+
+
+def post_scopes(post) -> list:
+    """Ленты, в которые попадает пост."""
+    scopes = ['index', f'author:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def get_feed_count(scope):
+    """Точное число постов ленты из кэша или None."""
+    return cache.get(FEED_COUNT_KEY.format(scope))
+
+
+def set_feed_count(scope, count: int):
+    cache.set(
+        FEED_COUNT_KEY.format(scope), count, settings.FEED_COUNT_TIMEOUT
+    )
+
+
+def change_feed_counts(scopes, delta: int):
+    """Сдвигает закэшированные счётчики; отсутствующие не трогает."""
+    for scope in scopes:
+        try:
+            cache.incr(FEED_COUNT_KEY.format(scope), delta)
+        except ValueError:
+            pass
+
+
+def get_feed_version(scopes) -> str:
+    """Версия ленты из поколений её областей, одним get_many.
+
+    Пропавшее поколение заводится заново от текущего времени, чтобы
+    не совпасть со значением, под которым уже лежат фрагменты.
+    """
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, time.time_ns(), None)
+            generations[key] = cache.get(key)
+    return '.'.join(str(generations[key]) for key in keys)
+
+
+def bump_generations(scopes):
+    """Сбрасывает закэшированные фрагменты областей."""
+    for scope in scopes:
+        try:
+            cache.incr(GENERATION_KEY.format(scope))
+        except ValueError:
+            pass
+
+
+def post_fragment_key(post) -> str:
+    return POST_FRAGMENT_KEY.format(post.id, post.modified.timestamp())
+
+
+def get_post_fragments(posts) -> dict:
+    """Закэшированная разметка постов по id, одним get_many."""
+    keys = {post_fragment_key(post): post.id for post in posts}
+    return {
+        keys[key]: html for key, html in cache.get_many(list(keys)).items()
+    }
+
+
+def set_post_fragments(fragments):
+    """Кладёт разметку {пост: html}; новая версия поста даёт новый ключ."""
+    cache.set_many(
+        {post_fragment_key(post): html for post, html in fragments.items()},
+        settings.POST_FRAGMENT_TIMEOUT,
+    )
+
+
+def identity_key(model, field, value) -> str:
+    """Ключ по хешу значения: в slug и username бывают любые символы."""
+    digest = hashlib.md5(str(value).encode()).hexdigest()
+    return IDENTITY_KEY.format(model._meta.label_lower, field, digest)
+
+
+def get_identity(model, field, value):
+    """id объекта по уникальному полю, MISSING или None, если не знаем."""
+    return cache.get(identity_key(model, field, value))
+
+
+def set_identity(model, field, value, pk):
+    """Запоминает id; отсутствие объекта хранится недолго."""
+    if pk is None:
+        cache.set(
+            identity_key(model, field, value),
+            MISSING,
+            settings.IDENTITY_MISS_TIMEOUT,
+        )
+    else:
+        cache.set(
+            identity_key(model, field, value), pk, settings.IDENTITY_TIMEOUT
+        )
+
+
+def drop_identities(model, field, values):
+    cache.delete_many([
+        identity_key(model, field, value)
+        for value in values if value is not None
+    ])
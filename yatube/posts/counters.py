@@ -0,0 +1,60 @@
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, Profile
+
+
+def change_profile(user_id, field, delta: int):
+    Profile.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta}
+    )
+
+
+def change_comments(post_id, delta: int):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta,
+        modified=timezone.now(),
+    )
+
+
+def _counts(queryset, field, ids) -> dict:
+    return dict(
+        queryset.filter(**{f'{field}__in': ids}).order_by().values(
+            field
+        ).annotate(total=Count('id')).values_list(field, 'total')
+    )
+
+
+def recount_profiles(user_ids) -> int:
+    """Пересчитывает счётчики пользователей из списка, создаёт недостающие."""
+    Profile.objects.bulk_create(
+        (Profile(user_id=user_id) for user_id in user_ids),
+        ignore_conflicts=True,
+    )
+    posts = _counts(Post.objects, 'author', user_ids)
+    followers = _counts(Follow.objects, 'author', user_ids)
+    following = _counts(Follow.objects, 'user', user_ids)
+    profiles = list(Profile.objects.filter(user_id__in=user_ids))
+    for profile in profiles:
+        profile.posts_count = posts.get(profile.user_id, 0)
+        profile.followers_count = followers.get(profile.user_id, 0)
+        profile.following_count = following.get(profile.user_id, 0)
+    Profile.objects.bulk_update(
+        profiles, ['posts_count', 'followers_count', 'following_count']
+    )
+    return len(profiles)
+
+
+def recount_comments(post_ids) -> int:
+    """Пересчитывает число комментариев у постов из списка."""
+    comments = _counts(Comment.objects, 'post', post_ids)
+    posts = list(Post.objects.filter(pk__in=post_ids).only('comments_count'))
+    changed = []
+    for post in posts:
+        count = comments.get(post.id, 0)
+        if post.comments_count != count:
+            post.comments_count = count
+            post.modified = timezone.now()
+            changed.append(post)
+    Post.objects.bulk_update(changed, ['comments_count', 'modified'])
+    return len(posts)
@@ -0,0 +1,199 @@
+import heapq
+
+from django.conf import settings
+
+from .cache import bump_generations, post_scopes
+from .models import Follow, Post, Profile, TimelineEntry
+from .utils import keyset_slice
+
+TIMELINE_KEY = ('pub_date', 'post_id')
+
+
+def is_pulled(author_id) -> bool:
+    """Посты автора с большим числом подписчиков читаются при запросе."""
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.FEED_PULL_THRESHOLD,
+    ).exists()
+
+
+def pulled_authors(user) -> list:
+    """Авторы из подписок пользователя, которых не раскладывают по лентам."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__profile__followers_count__gte=(
+                settings.FEED_PULL_THRESHOLD
+            ),
+        ).values_list('author_id', flat=True)
+    )
+
+
+def follow_scopes(author_id) -> list:
+    """Ленты подписок, в которые раскладываются посты автора."""
+    if is_pulled(author_id):
+        return []
+    return [
+        f'follow:{user_id}' for user_id in Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+    ]
+
+
+def bump_post_feeds(post_id):
+    """Сбрасывает разметку поста и всех лент, где он показан."""
+    post = Post.objects.filter(pk=post_id).only('author', 'group').first()
+    if post is not None:
+        bump_generations(
+            post_scopes(post)
+            + follow_scopes(post.author_id)
+            + [f'post:{post_id}']
+        )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(follow):
+    """Добавляет в ленту подписчика последние посты автора."""
+    if is_pulled(follow.author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=follow.author_id
+    ).values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=follow.user_id, post_id=post_id, pub_date=pub_date
+            )
+            for post_id, pub_date in posts
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def push_if_unpopular(author_id):
+    """Раскладывает посты автора, только что ставшего непопулярным.
+
+    Пока автор читался при запросе, его новые посты в ленты не попадали;
+    без раскладки они пропали бы из лент подписчиков.
+    """
+    if not Profile.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FEED_PULL_THRESHOLD - 1,
+    ).exists():
+        return
+    posts = list(
+        Post.objects.filter(author_id=author_id).values_list(
+            'id', 'pub_date'
+        )[:settings.TIMELINE_BACKFILL_LIMIT]
+    )
+    followers = list(
+        Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id in followers
+            for post_id, pub_date in posts
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    bump_generations([f'follow:{user_id}' for user_id in followers])
+
+
+def trim(follow):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        post__author_id=follow.author_id,
+    ).delete()
+
+
+class HybridFeed:
+    """Лента подписок: разложенные записи плюс посты популярных авторов.
+
+    Источники читаются по курсору независимо и сливаются k-путевым
+    слиянием по (pub_date, id); повторы одного поста отбрасываются.
+    """
+
+    def __init__(self, user, pulled=None):
+        self.timeline = user.timeline.select_related(
+            'post__author', 'post__group'
+        )
+        if pulled is None:
+            pulled = pulled_authors(user)
+        self.pulled_authors = pulled
+        self.pulled = [
+            Post.objects.filter(
+                author_id=author_id
+            ).select_related('author', 'group')
+            for author_id in pulled
+        ]
+
+    def count(self) -> int:
+        """Записи ленты без постов читаемых авторов и их посты.
+
+        Записи читаемых авторов остаются от времени, когда их посты
+        раскладывались; в ленте они совпадают с прочитанными.
+        """
+        timeline = self.timeline
+        if self.pulled_authors:
+            timeline = timeline.exclude(
+                post__author_id__in=self.pulled_authors
+            )
+        return timeline.count() + sum(
+            posts.count() for posts in self.pulled
+        )
+
+    def keyset_slice(
+            self, cursor=None, backwards=False, limit=None, *args, **kwargs
+    ) -> list:
+        entries = keyset_slice(
+            self.timeline, cursor, backwards, limit, TIMELINE_KEY
+        )
+        sources = [[entry.post for entry in entries]]
+        sources += [
+            keyset_slice(posts, cursor, backwards, limit)
+            for posts in self.pulled
+        ]
+        return self._merge(sources, backwards)[:limit]
+
+    def __getitem__(self, window):
+        stop = window.stop
+        entries = self.timeline.order_by('-pub_date', '-post_id')[:stop]
+        sources = [[entry.post for entry in entries]]
+        sources += [list(posts[:stop]) for posts in self.pulled]
+        return self._merge(sources)[window]
+
+    @staticmethod
+    def _merge(sources, backwards=False) -> list:
+        merged = []
+        seen = set()
+        for post in heapq.merge(
+            *sources,
+            key=lambda post: (post.pub_date, post.id),
+            reverse=not backwards,
+        ):
+            if post.id not in seen:
+                seen.add(post.id)
+                merged.append(post)
+        return merged
@@ -1,6 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import bounded_image
 from .models import Comment, Post
+from .widgets import AutocompleteSelect
 
 
 class PostForm(forms.ModelForm):
@@ -18,6 +21,15 @@ class PostForm(forms.ModelForm):
             'group': 'Группа',
             'image': 'Изображение',
         }
+        widgets = {
+            'group': AutocompleteSelect('groups'),
+        }
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return bounded_image(image)
+        return image
 
 
 class CommentForm(forms.ModelForm):
@@ -0,0 +1,99 @@
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+# Форматы, которые Pillow умеет декодировать сразу в уменьшенном виде.
+DRAFT_FORMATS = {'JPEG'}
+# Поля поста с данными картинки, когда картинки нет.
+NO_METADATA = {
+    'image_width': None,
+    'image_height': None,
+    'image_format': '',
+    'image_size': None,
+}
+
+
+def fit(size, side: int) -> tuple:
+    """Размер, вписанный в квадрат со стороной side."""
+    width, height = size
+    scale = side / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def bounded_image(upload):
+    """Проверяет загрузку по заголовку и уменьшает слишком большую.
+
+    Размер файла и число пикселей проверяются до декодирования.
+    JPEG декодируется в режиме draft сразу в уменьшенном масштабе,
+    поэтому пиковая память зависит от IMAGE_MAX_SIDE, а не от снимка.
+    """
+    if upload.size > settings.IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            code='file_too_large',
+            params={'limit': settings.IMAGE_MAX_BYTES // 2 ** 20},
+        )
+    upload.seek(0)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            image = Image.open(upload)
+    except (Image.DecompressionBombWarning, Image.DecompressionBombError):
+        raise ValidationError(
+            'Слишком много пикселей.', code='too_many_pixels'
+        )
+    try:
+        with image:
+            width, height = image.size
+            limit = (
+                settings.IMAGE_MAX_PIXELS if image.format in DRAFT_FORMATS
+                else settings.IMAGE_DECODE_PIXELS
+            )
+            if width * height > limit:
+                raise ValidationError(
+                    'Слишком много пикселей.', code='too_many_pixels'
+                )
+            if max(width, height) <= settings.IMAGE_MAX_SIDE:
+                upload.seek(0)
+                return upload
+            return downsample(image, upload)
+    except OSError:
+        raise ValidationError(
+            'Файл картинки повреждён.', code='broken_image'
+        )
+
+
+def downsample(image, upload):
+    """Уменьшает оригинал до IMAGE_MAX_SIDE, сохраняя формат и имя.
+
+    Поворот из EXIF применяется к пикселям: метаданные не переносятся.
+    """
+    image_format = image.format
+    if image_format in DRAFT_FORMATS:
+        image.draft('RGB', fit(image.size, settings.IMAGE_MAX_SIDE))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(fit(image.size, settings.IMAGE_MAX_SIDE))
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+    return SimpleUploadedFile(
+        upload.name, buffer.getvalue(), upload.content_type
+    )
+
+
+def image_metadata(file) -> dict:
+    """Размеры, формат и вес картинки; Pillow читает только заголовок."""
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        image_format = image.format
+    file.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_format': image_format,
+        'image_size': file.size,
+    }
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.feeds import bump_post_feeds
+from posts.images import NO_METADATA, image_metadata
+from posts.models import Post
+
+from .recount_counters import chunks
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, формат и вес картинок старых постов, '
+        'читая только заголовки файлов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_width__isnull=True
+        )
+        filled = failed = 0
+        for ids in chunks(posts, options['chunk_size']):
+            batch = []
+            for post in Post.objects.filter(pk__in=ids).only('image'):
+                try:
+                    with post.image.open('rb') as file:
+                        metadata = image_metadata(file)
+                except (OSError, SyntaxError) as error:
+                    self.stderr.write(f'Пост {post.id}: {error}')
+                    failed += 1
+                    continue
+                for field, value in metadata.items():
+                    setattr(post, field, value)
+                post.modified = timezone.now()
+                batch.append(post)
+            Post.objects.bulk_update(batch, [*NO_METADATA, 'modified'])
+            for post in batch:
+                bump_post_feeds(post.id)
+            filled += len(batch)
+        self.stdout.write(f'Заполнено: {filled}, с ошибками: {failed}')
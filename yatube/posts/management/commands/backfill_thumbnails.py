@@ -0,0 +1,53 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+from .recount_counters import chunks
+
+DRAWN, READY, FAILED = 'drawn', 'ready', 'failed'
+
+
+class Command(BaseCommand):
+    help = (
+        'Дорисовывает недостающие варианты картинок постов: '
+        'все ширины и форматы для srcset'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=2)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        results = Counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            # map забирает весь итератор сразу, поэтому порции — по одной.
+            for ids in chunks(posts, options['chunk_size']):
+                if options['concurrency'] == 1:
+                    results.update(self.run(post_id) for post_id in ids)
+                else:
+                    results.update(pool.map(self.run_in_thread, ids))
+        self.stdout.write(
+            f'Нарисовано: {results[DRAWN]}, '
+            f'уже готово: {results[READY]}, '
+            f'с ошибками: {results[FAILED]}'
+        )
+
+    def run(self, post_id):
+        try:
+            drawn = generate_thumbnails(post_id)
+        except Exception as error:
+            self.stderr.write(f'Пост {post_id}: {error}')
+            return FAILED
+        return DRAWN if drawn else READY
+
+    def run_in_thread(self, post_id):
+        try:
+            return self.run(post_id)
+        finally:
+            connection.close()
@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from posts.counters import recount_profiles
+from posts.feeds import HybridFeed
+from posts.models import Follow, Post
+
+User = get_user_model()
+# Сигналы постов правят счётчики и поколения в кэше, а откат базы их
+# не возвращает: замер идёт на отдельном кэше процесса.
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench-feed',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает раскладку при записи, чтение при запросе и гибридную '
+        'ленту на скошенном по Ципфу распределении подписчиков. '
+        'Все данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=3)
+        parser.add_argument('--skew', type=float, default=1.1)
+        parser.add_argument('--threshold', type=int, default=200)
+        parser.add_argument('--readers', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        strategies = {
+            'push': 10 ** 12,
+            'pull': 0,
+            'hybrid': options['threshold'],
+        }
+        with override_settings(CACHES=BENCH_CACHES), transaction.atomic():
+            users, authors = self.populate(options)
+            readers = random.sample(users, min(options['readers'], len(users)))
+            self.stdout.write(
+                f'{"стратегия":>10} {"запись, мс/пост":>16} '
+                f'{"чтение p50, мс":>15} {"чтение p95, мс":>15}'
+            )
+            for name, threshold in strategies.items():
+                with override_settings(FEED_PULL_THRESHOLD=threshold):
+                    write, reads = self.measure(authors, readers, options)
+                reads.sort()
+                self.stdout.write(
+                    f'{name:>10} {write * 1000:>16.2f} '
+                    f'{statistics.median(reads) * 1000:>15.2f} '
+                    f'{reads[int(len(reads) * 0.95)] * 1000:>15.2f}'
+                )
+            transaction.set_rollback(True)
+
+    def populate(self, options):
+        User.objects.bulk_create(
+            User(username=f'bench-{index}')
+            for index in range(options['users'])
+        )
+        users = list(User.objects.filter(username__startswith='bench-'))
+        authors = users[:options['authors']]
+        follows = []
+        for rank, author in enumerate(authors, start=1):
+            followers = max(
+                1, int(len(users) / rank ** options['skew'])
+            )
+            for user in random.sample(users, followers):
+                if user != author:
+                    follows.append(Follow(user=user, author=author))
+        Follow.objects.bulk_create(follows, batch_size=500)
+        for start in range(0, len(users), 500):
+            recount_profiles([user.id for user in users[start:start + 500]])
+        self.stdout.write(
+            f'читателей: {len(users)}, авторов: {len(authors)}, '
+            f'подписок: {len(follows)}'
+        )
+        return users, authors
+
+    def measure(self, authors, readers, options):
+        with transaction.atomic():
+            started = time.perf_counter()
+            for _ in range(options['posts']):
+                for author in authors:
+                    Post.objects.create(author=author, text='Тестовый пост')
+            write = (time.perf_counter() - started) / (
+                options['posts'] * len(authors)
+            )
+            reads = []
+            for reader in readers:
+                started = time.perf_counter()
+                HybridFeed(reader).keyset_slice(limit=11)
+                reads.append(time.perf_counter() - started)
+            transaction.set_rollback(True)
+        return write, reads
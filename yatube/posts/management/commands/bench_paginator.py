@@ -0,0 +1,52 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+
+from posts.models import Post
+from posts.utils import get_page
+
+PAGE_COUNTS = (10, 100, 1000, 10000, 50000)
+
+
+class SyntheticFeed:
+    """Лента заданной длины без обращений к базе."""
+
+    def __init__(self, size):
+        self.size = size
+        self.now = timezone.now()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, window):
+        return [
+            Post(id=self.size - index, pub_date=self.now)
+            for index in range(*window.indices(self.size))
+        ]
+
+
+class Command(BaseCommand):
+    help = 'Замеряет отрисовку includes/paginator.html при росте числа страниц'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        self.stdout.write(f'{"страниц":>10} {"мкс/рендер":>12} {"байт":>8}')
+        for pages in PAGE_COUNTS:
+            request = factory.get('/', {'page': pages // 2})
+            page_obj = get_page(request, SyntheticFeed(pages * 10))
+            context = {'page_obj': page_obj}
+            html = render_to_string('includes/paginator.html', context)
+            seconds = timeit.timeit(
+                lambda: render_to_string('includes/paginator.html', context),
+                number=options['repeat'],
+            )
+            self.stdout.write(
+                f'{pages:>10} {seconds / options["repeat"] * 1e6:>12.1f} '
+                f'{len(html):>8}'
+            )
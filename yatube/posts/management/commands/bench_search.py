@@ -0,0 +1,122 @@
+import itertools
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.search import rebuild_index, search_posts
+
+User = get_user_model()
+SYLLABLES = [
+    consonant + vowel
+    for consonant in 'бвгдзклмнпрстхц' for vowel in 'аеиоуя'
+]
+
+
+def vocabulary(size) -> list:
+    """Псевдослова из слогов: словарь нужного размера без повторов."""
+    words = (
+        ''.join(parts)
+        for length in itertools.count(2)
+        for parts in itertools.product(SYLLABLES, repeat=length)
+    )
+    return list(itertools.islice(words, size))
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет поиск FTS5 и LIKE на сгенерированном корпусе постов '
+        'со словами по закону Ципфа. Все данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--words', type=int, default=30)
+        parser.add_argument('--vocabulary', type=int, default=50_000)
+        parser.add_argument('--skew', type=float, default=1.1)
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--like-queries', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        words = vocabulary(options['vocabulary'])
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.populate(words, options)
+            rebuild_index()
+            self.stdout.write(
+                f'постов: {options["posts"]}, корпус и индекс за '
+                f'{time.perf_counter() - started:.0f} с'
+            )
+            self.stdout.write(
+                f'{"запрос":>30} {"p50, мс":>10} {"p95, мс":>10}'
+            )
+            bands = {
+                'частое слово': words[:10],
+                'среднее слово': words[100:1000],
+                'редкое слово': words[-1000:],
+            }
+            for name, band in bands.items():
+                queries = random.choices(band, k=options['queries'])
+                self.report(f'fts: {name}', self.measure_fts(queries))
+                self.report(
+                    f'fts, 5 страниц: {name}',
+                    self.measure_fts(queries, pages=5),
+                )
+                self.report(
+                    f'like: {name}',
+                    self.measure_like(queries[:options['like_queries']]),
+                )
+            transaction.set_rollback(True)
+
+    def populate(self, words, options):
+        author, _ = User.objects.get_or_create(username='bench-search')
+        weights = list(itertools.accumulate(
+            1 / rank ** options['skew'] for rank in range(1, len(words) + 1)
+        ))
+        posts = (
+            Post(author=author, text=' '.join(random.choices(
+                words, cum_weights=weights, k=options['words']
+            )))
+            for _ in range(options['posts'])
+        )
+        while True:
+            batch = list(itertools.islice(posts, 5000))
+            if not batch:
+                return
+            Post.objects.bulk_create(batch)
+
+    def measure_fts(self, queries, pages=1) -> list:
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            after = None
+            for _ in range(pages):
+                results = search_posts(query, Post.objects, after=after)
+                after = results.next_cursor
+                if after is None:
+                    break
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def measure_like(self, queries) -> list:
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            list(Post.objects.filter(text__icontains=query)[:10])
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def report(self, name, timings):
+        if not timings:
+            return
+        timings.sort()
+        self.stdout.write(
+            f'{name:>30} {statistics.median(timings) * 1000:>10.2f} '
+            f'{timings[int(len(timings) * 0.95)] * 1000:>10.2f}'
+        )
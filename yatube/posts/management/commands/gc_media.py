@@ -0,0 +1,156 @@
+import os
+import shutil
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from posts.models import Post
+
+
+def scan(path):
+    """Файлы дерева по одному: os.scandir без списка всего каталога."""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def orphan_originals(names) -> list:
+    """Оригиналы, на которые не ссылается ни один пост."""
+    referenced = set(
+        Post.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+    return [name for name in names if name not in referenced]
+
+
+def orphan_thumbnails(names) -> list:
+    """Миниатюры, о которых не знает хранилище ключей sorl.
+
+    Записи миниатюр удаляются вместе с оригиналом, поэтому без записи
+    остаются только файлы удалённых оригиналов и старых размеров.
+    """
+    keys = {
+        add_prefix(ImageFile(name, default.storage).key): name
+        for name in names
+    }
+    tracked = set(
+        KVStore.objects.filter(key__in=list(keys)).values_list(
+            'key', flat=True
+        )
+    )
+    return [name for key, name in keys.items() if key not in tracked]
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из MEDIA_ROOT картинки, на которые не ссылаются посты, '
+        'и миниатюры без записи в хранилище ключей sorl'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument(
+            '--quarantine',
+            help='Каталог, куда переносить сирот вместо удаления',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=0,
+            help='Не больше файлов в секунду; 0 — без ограничения',
+        )
+        parser.add_argument(
+            '--min-age', type=float, default=60 * 60,
+            help='Секунды; свежие файлы могут ждать коммита поста',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.checked = self.removed = self.freed = 0
+        passes = (
+            (Post.image.field.upload_to, self.remove_original,
+             orphan_originals),
+            (thumbnail_settings.THUMBNAIL_PREFIX, self.remove,
+             orphan_thumbnails),
+        )
+        for prefix, remove, find_orphans in passes:
+            directory = os.path.join(settings.MEDIA_ROOT, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for batch in batches(self.old_files(directory),
+                                 options['batch_size']):
+                entries = {self.media_name(entry): entry for entry in batch}
+                for name in find_orphans(list(entries)):
+                    remove(name, entries[name].path)
+        action = 'Нашлось бы' if options['dry_run'] else 'Убрано'
+        self.stdout.write(
+            f'Проверено файлов: {self.checked}, {action} сирот: '
+            f'{self.removed}, {self.freed / 2 ** 20:.1f} МБ'
+        )
+
+    def old_files(self, directory):
+        deadline = time.time() - self.options['min_age']
+        for entry in scan(directory):
+            self.checked += 1
+            if entry.stat().st_mtime <= deadline:
+                yield entry
+
+    def media_name(self, entry) -> str:
+        name = os.path.relpath(entry.path, settings.MEDIA_ROOT)
+        return name.replace(os.sep, '/')
+
+    def remove_original(self, name, path):
+        """Убирает оригинал, его миниатюры и записи о них в sorl.
+
+        Миниатюры проходят тот же путь, что и оригинал: карантин,
+        ограничение скорости и счётчики.
+        """
+        self.remove(name, path)
+        kvstore = default.kvstore
+        source = ImageFile(name, Post.image.field.storage)
+        for key in kvstore._get(source.key, identity='thumbnails') or ():
+            thumbnail = kvstore._get(key)
+            if thumbnail is None:
+                continue
+            thumbnail_path = default.storage.path(thumbnail.name)
+            if os.path.isfile(thumbnail_path):
+                self.remove(thumbnail.name, thumbnail_path)
+            if not self.options['dry_run']:
+                kvstore.delete(thumbnail, delete_thumbnails=False)
+        if not self.options['dry_run']:
+            kvstore._delete(source.key, identity='thumbnails')
+            kvstore.delete(source, delete_thumbnails=False)
+
+    def remove(self, name, path):
+        self.removed += 1
+        self.freed += os.stat(path).st_size
+        if self.options['verbosity'] > 1:
+            self.stdout.write(name)
+        if self.options['dry_run']:
+            return
+        quarantine = self.options['quarantine']
+        if quarantine:
+            target = os.path.join(quarantine, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+        else:
+            os.remove(path)
+        if self.options['rate']:
+            time.sleep(1 / self.options['rate'])
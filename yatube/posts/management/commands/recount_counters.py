@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_comments, recount_profiles
+from posts.models import Post
+
+User = get_user_model()
+
+
+def chunks(queryset, size):
+    """Идёт по первичным ключам порциями, не загружая всю таблицу."""
+    last = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last).order_by('pk').values_list(
+                'pk', flat=True
+            )[:size]
+        )
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, подписок и комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        size = options['chunk_size']
+        users = sum(
+            recount_profiles(ids) for ids in chunks(User.objects, size)
+        )
+        posts = sum(
+            recount_comments(ids) for ids in chunks(Post.objects, size)
+        )
+        self.stdout.write(
+            f'Пересчитано пользователей: {users}, постов: {posts}'
+        )
@@ -0,0 +1,106 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from posts.models import Group, Post, Profile
+from posts.thumbnails import generate_thumbnails
+
+DONE, FAILED, SKIPPED = 'done', 'failed', 'skipped'
+
+
+def render_page(path):
+    """Отрисовывает страницу для гостя, заполняя кэши по пути."""
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    match = resolve(request.path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        raise ValueError(f'{path}: {response.status_code}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет кэши после запуска: первые страницы главной, '
+        'популярные группы и авторов, миниатюры свежих постов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--authors', type=int, default=10)
+        parser.add_argument('--thumbnails', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--time-budget', type=float, default=60,
+            help='Секунды; задачи, не начатые к сроку, пропускаются',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        deadline = started + options['time_budget']
+        run = partial(self.run, deadline=deadline)
+        tasks = list(self.tasks(options))
+        if options['concurrency'] == 1:
+            results = [run(task) for task in tasks]
+        else:
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                results = list(pool.map(
+                    partial(run, close_connection=True), tasks
+                ))
+        self.stdout.write(
+            f'Прогрето: {results.count(DONE)}, '
+            f'с ошибками: {results.count(FAILED)}, '
+            f'пропущено по времени: {results.count(SKIPPED)} '
+            f'за {time.monotonic() - started:.1f} с'
+        )
+
+    def tasks(self, options):
+        """Задачи по убыванию пользы.
+
+        Миниатюры идут первыми, чтобы страницы легли в кэш с картинками.
+        """
+        posts = Post.objects.exclude(image='').values_list('id', flat=True)
+        for post_id in posts[:options['thumbnails']]:
+            yield partial(generate_thumbnails, post_id)
+        index = reverse('posts:index')
+        # Ключ фрагмента — полный путь: первая страница — это «/».
+        if options['pages'] > 0:
+            yield partial(render_page, index)
+        for number in range(2, options['pages'] + 1):
+            yield partial(render_page, f'{index}?page={number}')
+        groups = Group.objects.annotate(
+            posts_total=Count('posts')
+        ).order_by('-posts_total').values_list('slug', flat=True)
+        for slug in groups[:options['groups']]:
+            yield partial(
+                render_page,
+                reverse('posts:group_posts', kwargs={'slug': slug}),
+            )
+        authors = Profile.objects.order_by(
+            '-followers_count'
+        ).values_list('user__username', flat=True)
+        for username in authors[:options['authors']]:
+            yield partial(
+                render_page,
+                reverse('posts:profile', kwargs={'username': username}),
+            )
+
+    def run(self, task, deadline, close_connection=False):
+        if time.monotonic() >= deadline:
+            return SKIPPED
+        try:
+            task()
+        except Exception as error:
+            self.stderr.write(f'{task.func.__name__}: {error}')
+            return FAILED
+        finally:
+            if close_connection:
+                connection.close()
+        return DONE
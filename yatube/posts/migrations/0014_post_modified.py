@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-17 21:04
+
+from django.db import migrations, models
+
+
+def fill_modified(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(modified=models.F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_auto_20261017_2055'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(fill_modified, migrations.RunPython.noop),
+    ]
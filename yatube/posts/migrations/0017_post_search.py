@@ -0,0 +1,22 @@
+from django.db import migrations
+
+CREATE = """
+CREATE VIRTUAL TABLE posts_post_search USING fts5(
+    text,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3 4'
+)
+"""
+FILL = 'INSERT INTO posts_post_search(rowid, text) SELECT id, text FROM posts_post'
+DROP = 'DROP TABLE posts_post_search'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunSQL([CREATE, FILL], DROP),
+    ]
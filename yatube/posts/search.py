@@ -0,0 +1,174 @@
+"""Полнотекстовый поиск по постам на FTS5-таблице SQLite."""
+import base64
+import binascii
+import re
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .utils import MAX_ID
+
+SEARCH_TABLE = 'posts_post_search'
+# Сколько слов запроса идёт в выражение MATCH.
+MAX_QUERY_WORDS = 10
+# Короче префикс не ищется: для него в таблице нет индекса префиксов.
+MIN_PREFIX = 2
+
+
+class Results(NamedTuple):
+    posts: list
+    next_cursor: Optional[str]
+
+
+def match_expression(query) -> str:
+    """Запрос пользователя как выражение FTS5: все слова, последнее — префикс.
+
+    Слова берутся регулярным выражением и заключаются в кавычки,
+    поэтому синтаксис FTS5 из запроса не исполняется.
+    """
+    words = re.findall(r'\w+', query)[:MAX_QUERY_WORDS]
+    terms = [f'"{word}"' for word in words]
+    if words and len(words[-1]) >= MIN_PREFIX:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def encode_cursor(rank, pk, bound, below) -> str:
+    raw = f'{rank!r}|{pk}|{bound}|{"" if below is None else below}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(rank, id, нижняя и верхняя граница окна) или None для битого.
+
+    Верхняя граница None у первого, самого нового окна.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        rank, pk, bound, below = raw.decode().split('|')
+        cursor = (
+            float(rank), int(pk), int(bound),
+            int(below) if below else None,
+        )
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    _, pk, bound, below = cursor
+    if not (
+        0 < pk <= MAX_ID and 0 <= bound <= MAX_ID
+        and (below is None or 0 < below <= MAX_ID)
+    ):
+        return None
+    return cursor
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post.id]
+        )
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (%s, %s)',
+            [post.id, post.text],
+        )
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post_id]
+        )
+
+
+def rebuild_index():
+    """Заполняет индекс заново, например после bulk_create."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE}(rowid, text) '
+            'SELECT id, text FROM posts_post'
+        )
+
+
+def matching_ids(match) -> RawSQL:
+    """Подзапрос id постов под выражение MATCH, для pk__in."""
+    return RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+        [match],
+    )
+
+
+def window_bound(match, below=None) -> int:
+    """Наименьший id среди SEARCH_CANDIDATES новейших совпадений до below.
+
+    FTS5 идёт по списку совпадений в порядке rowid и останавливается,
+    а bm25 потом считается только для строк окна. 0 — окно последнее.
+    """
+    sql = f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+    params = [match]
+    if below is not None:
+        sql += ' AND rowid < %s'
+        params.append(below)
+    sql += ' ORDER BY rowid DESC LIMIT 1 OFFSET %s'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [settings.SEARCH_CANDIDATES - 1])
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def ranked_ids(match, bound, below=None, cursor=None,
+               limit=settings.POSTS_ON_PAGE) -> list:
+    """(rank, id) совпадений окна по bm25, за курсором и без OFFSET."""
+    sql = (
+        f'SELECT rank, rowid FROM {SEARCH_TABLE} '
+        f'WHERE {SEARCH_TABLE} MATCH %s AND rowid >= %s'
+    )
+    params = [match, bound]
+    if below is not None:
+        sql += ' AND rowid < %s'
+        params.append(below)
+    if cursor is not None:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [cursor[0], cursor[0], cursor[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params + [limit])
+        return db_cursor.fetchall()
+
+
+def search_posts(query, queryset, after=None,
+                 limit=settings.POSTS_ON_PAGE) -> Results:
+    """Страница постов по убыванию релевантности и курсор следующей.
+
+    Совпадения ранжируются окнами по SEARCH_CANDIDATES от новых
+    к старым: исчерпав окно, страница добирается из следующего,
+    так что доступны все совпадения. Границы окна едут в курсоре,
+    поэтому новые посты не сдвигают окна между страницами.
+    """
+    match = match_expression(query)
+    if not match:
+        return Results([], None)
+    cursor = decode_cursor(after) if after else None
+    if cursor:
+        position, bound, below = cursor[:2], cursor[2], cursor[3]
+    else:
+        position, bound, below = None, window_bound(match), None
+    rows = []
+    while True:
+        found = ranked_ids(
+            match, bound, below, position, limit + 1 - len(rows)
+        )
+        rows += [(rank, pk, bound, below) for rank, pk in found]
+        if len(rows) > limit or not bound:
+            break
+        position, below = None, bound
+        bound = window_bound(match, below)
+    page = rows[:limit]
+    posts = queryset.in_bulk([row[1] for row in page])
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(*page[-1])
+    return Results(
+        [posts[row[1]] for row in page if row[1] in posts], next_cursor
+    )
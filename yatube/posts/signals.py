@@ -0,0 +1,200 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .autocomplete import INDEXES, group_keys, user_keys
+from .cache import (
+    bump_generations, change_feed_counts, drop_identities, post_scopes,
+)
+from .counters import change_comments, change_profile
+from .feeds import (
+    backfill, bump_post_feeds, fan_out, follow_scopes, push_if_unpopular,
+    trim,
+)
+from .images import NO_METADATA, image_metadata
+from .models import Comment, Follow, Group, Post, Profile
+from .search import index_post, unindex_post
+from .thumbnails import schedule_thumbnails
+
+User = get_user_model()
+IDENTITY_FIELDS = {Group: 'slug', User: 'username'}
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, update_fields, **kwargs):
+    if created:
+        Profile.objects.get_or_create(user=instance)
+    elif update_fields is None or set(update_fields) - {'last_login'}:
+        Post.objects.filter(author=instance).update(modified=timezone.now())
+        bump_generations(['catalog'])
+
+
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    bump_generations(['catalog'])
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def forget_group(sender, instance, **kwargs):
+    """Меняет версию постов группы: в их разметке есть её slug."""
+    Post.objects.filter(group=instance).update(modified=timezone.now())
+    bump_generations(['catalog', f'group:{instance.id}'])
+
+
+@receiver(pre_save, sender=Group)
+@receiver(pre_save, sender=User)
+def remember_identity(sender, instance, update_fields, **kwargs):
+    field = IDENTITY_FIELDS[sender]
+    instance._identity_changed = (
+        update_fields is None or field in update_fields
+    )
+    instance._saved_identity = None
+    if instance.pk and instance._identity_changed:
+        instance._saved_identity = sender.objects.filter(
+            pk=instance.pk
+        ).values_list(field, flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=User)
+def forget_saved_identity(sender, instance, **kwargs):
+    """Сбрасывает старое значение и отрицательную запись для нового."""
+    if instance._identity_changed:
+        field = IDENTITY_FIELDS[sender]
+        drop_identities(
+            sender, field, [getattr(instance, field), instance._saved_identity]
+        )
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def forget_deleted_identity(sender, instance, **kwargs):
+    field = IDENTITY_FIELDS[sender]
+    drop_identities(sender, field, [getattr(instance, field)])
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, update_fields, **kwargs):
+    if update_fields is None or 'username' in update_fields:
+        transaction.on_commit(partial(
+            INDEXES['users'].update,
+            instance.pk, instance.username, user_keys(instance.username),
+        ))
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, **kwargs):
+    transaction.on_commit(partial(
+        INDEXES['groups'].update,
+        instance.pk, instance.title, group_keys(instance.title, instance.slug),
+    ))
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def unindex_autocomplete(sender, instance, **kwargs):
+    index = INDEXES['groups' if sender is Group else 'users']
+    transaction.on_commit(partial(index.remove, instance.pk))
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, **kwargs):
+    saved = None
+    if instance.pk:
+        saved = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'text'
+        ).first()
+    (
+        instance._saved_group_id, instance._saved_image, instance._saved_text
+    ) = saved or (None, None, None)
+
+
+@receiver(pre_save, sender=Post)
+def read_image_metadata(sender, instance, **kwargs):
+    """Заполняет данные картинки по заголовку новой загрузки."""
+    if not instance.image:
+        metadata = NO_METADATA
+    elif not instance.image._committed:
+        metadata = image_metadata(instance.image.file)
+    else:
+        return
+    for field, value in metadata.items():
+        setattr(instance, field, value)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    scopes = post_scopes(instance)
+    follows = follow_scopes(instance.author_id)
+    if created:
+        change_profile(instance.author_id, 'posts_count', 1)
+        fan_out(instance)
+        change_feed_counts(scopes, 1)
+    elif instance._saved_group_id != instance.group_id:
+        if instance._saved_group_id:
+            scopes.append(f'group:{instance._saved_group_id}')
+            change_feed_counts([f'group:{instance._saved_group_id}'], -1)
+        if instance.group_id:
+            change_feed_counts([f'group:{instance.group_id}'], 1)
+    bump_generations(scopes + follows + [f'post:{instance.id}'])
+    if instance.text != instance._saved_text:
+        index_post(instance)
+    if instance.image and instance.image.name != instance._saved_image:
+        transaction.on_commit(partial(schedule_thumbnails, instance.id))
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    scopes = post_scopes(instance)
+    follows = follow_scopes(instance.author_id)
+    change_profile(instance.author_id, 'posts_count', -1)
+    change_feed_counts(scopes, -1)
+    bump_generations(scopes + follows + [f'post:{instance.id}'])
+    unindex_post(instance.id)
+
+
+def follow_changed(follow):
+    """Сбрасывает ленту подписчика и счётчики подписок на профилях."""
+    bump_generations([
+        f'follow:{follow.user_id}',
+        f'profile:{follow.user_id}',
+        f'profile:{follow.author_id}',
+    ])
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline(sender, instance, created, **kwargs):
+    if created:
+        change_profile(instance.user_id, 'following_count', 1)
+        change_profile(instance.author_id, 'followers_count', 1)
+        backfill(instance)
+    follow_changed(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    change_profile(instance.user_id, 'following_count', -1)
+    change_profile(instance.author_id, 'followers_count', -1)
+    trim(instance)
+    push_if_unpopular(instance.author_id)
+    follow_changed(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        change_comments(instance.post_id, 1)
+        bump_post_feeds(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_comments(instance.post_id, -1)
+    bump_post_feeds(instance.post_id)
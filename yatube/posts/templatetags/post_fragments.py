@@ -0,0 +1,29 @@
+from django import template
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from posts.cache import get_post_fragments, set_post_fragments
+from posts.thumbnails import ready_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_fragments(posts) -> list:
+    """Разметка постов страницы: из кэша, отрисовываются только промахи."""
+    posts = list(posts)
+    cached = get_post_fragments(posts)
+    misses = [post for post in posts if post.id not in cached]
+    thumbnails = ready_thumbnails(misses)
+    post_list = get_template('posts/includes/post_list.html')
+    missing = {
+        post: post_list.render(
+            {'post': post, 'thumbnail': thumbnails.get(post.id)}
+        )
+        for post in misses
+    }
+    if missing:
+        set_post_fragments(missing)
+    return [
+        mark_safe(cached.get(post.id) or missing[post]) for post in posts
+    ]
@@ -0,0 +1,157 @@
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts.autocomplete import INDEXES, PrefixIndex, user_keys
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = 0
+        self.names = {1: 'alice', 2: 'bob'}
+
+    def load(self):
+        self.calls += 1
+        for pk, name in list(self.names.items()):
+            yield pk, name, user_keys(name)
+
+    def test_first_build_runs_once(self):
+        """Одновременные первые запросы ждут одну сборку."""
+        def slow_load():
+            time.sleep(0.1)
+            return self.load()
+
+        index = PrefixIndex(slow_load)
+        barrier = threading.Barrier(8)
+
+        def search():
+            barrier.wait()
+            index.search('a', 10)
+
+        threads = [threading.Thread(target=search) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_index_refreshes_in_background(self):
+        """Устаревший индекс отвечает сразу, перестраивает его один поток."""
+        index = PrefixIndex(self.load)
+        index.build()
+        released = threading.Event()
+
+        def blocked_load():
+            released.wait(5)
+            return self.load()
+
+        index.load = blocked_load
+        index.built -= settings.AUTOCOMPLETE_REFRESH + 1
+        self.names[3] = 'alex'
+        for _ in range(3):
+            self.assertEqual(index.search('al', 10), [(1, 'alice')])
+        released.set()
+        with index.build_lock:
+            self.assertEqual(self.calls, 2)
+        self.assertEqual(
+            index.search('al', 10), [(3, 'alex'), (1, 'alice')]
+        )
+
+    def test_updates_during_build_are_replayed(self):
+        """Правка, пришедшая во время load(), не теряется при замене."""
+        index = PrefixIndex(self.load)
+        index.build()
+
+        def racing_load():
+            rows = list(self.load())
+            index.update(3, 'carol', user_keys('carol'))
+            index.remove(2)
+            return rows
+
+        index.load = racing_load
+        index.build()
+        self.assertEqual(index.search('c', 10), [(3, 'carol')])
+        self.assertEqual(index.search('b', 10), [])
+        self.assertIsNone(index.pending)
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        User.objects.create_user(username='tester')
+        User.objects.create_user(username='reader')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Котики и {topic}', slug=f'cats-{slug}',
+                description='Описание',
+            )
+            for topic, slug in (('собаки', 'dogs'), ('хомяки', 'hamsters'))
+        ]
+
+    def setUp(self):
+        for index in INDEXES.values():
+            index.reset()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def suggest(self, kind, query):
+        response = self.client.get(
+            reverse('posts:autocomplete', kwargs={'kind': kind}),
+            {'q': query},
+        )
+        return [item['text'] for item in response.json()['results']]
+
+    def test_prefix_matches(self):
+        self.assertEqual(self.suggest('users', 'TEST'), ['tester', 'TestUser'])
+        self.assertEqual(len(self.suggest('groups', 'кот')), 2)
+        self.assertEqual(self.suggest('groups', 'хом'), ['Котики и хомяки'])
+        self.assertEqual(self.suggest('groups', 'cats-d'), ['Котики и собаки'])
+        self.assertEqual(self.suggest('groups', ''), [])
+
+    def test_unknown_kind(self):
+        response = self.client.get(
+            reverse('posts:autocomplete', kwargs={'kind': 'posts'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_saves_update_built_index(self):
+        """После сборки правки попадают в индекс без запросов к базе."""
+        self.suggest('groups', 'кот')
+        group = Group.objects.get(pk=self.groups[0].pk)
+        group.title = 'Попугаи'
+        with mock.patch(
+            'django.db.transaction.on_commit', lambda callback: callback()
+        ):
+            group.save()
+            Group.objects.get(pk=self.groups[1].pk).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('groups', 'поп'), ['Попугаи'])
+            self.assertEqual(self.suggest('groups', 'кот'), [])
+
+    def test_form_renders_only_selected_group(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.groups[0]
+        )
+        create = self.authorized_client.get(reverse('posts:post_create'))
+        self.assertNotContains(create, self.groups[0].title)
+        edit = self.authorized_client.get(
+            reverse('posts:post_edit', kwargs={'post_id': post.id})
+        )
+        self.assertContains(edit, self.groups[0].title)
+        self.assertNotContains(edit, self.groups[1].title)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            {'text': 'Пост', 'group': self.groups[1].id},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.group, self.groups[1])
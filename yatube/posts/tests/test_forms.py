@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -11,6 +12,17 @@ from posts.models import Group, Post
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+# Хранилище называет картинки постов по sha256 содержимого.
+SMALL_GIF_HASH = hashlib.sha256(SMALL_GIF).hexdigest()
+SMALL_GIF_NAME = f'posts/{SMALL_GIF_HASH[:2]}/{SMALL_GIF_HASH}.gif'
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -66,7 +78,7 @@ class PostCreateFormTests(TestCase):
         latest_post = Post.objects.latest('pub_date')
         self.assertEqual(latest_post.text, form_data['text'])
         self.assertEqual(latest_post.group.id, form_data['group'])
-        self.assertEqual(latest_post.image, f"posts/{form_data['image']}")
+        self.assertEqual(latest_post.image, SMALL_GIF_NAME)
 
     def test_post_changes(self):
         post = Post.objects.create(
@@ -97,7 +109,7 @@ class PostCreateFormTests(TestCase):
         latest_post = Post.objects.latest('pub_date')
         self.assertEqual(latest_post.text, form_data['text'])
         self.assertEqual(latest_post.group.id, form_data['group'])
-        self.assertEqual(latest_post.image.name, f"posts/{form_data['image']}")
+        self.assertEqual(latest_post.image.name, SMALL_GIF_NAME)
 
 
 class CommentsFormTests(TestCase):
@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post
+from posts.thumbnails import (
+    CARD_FORMAT, CARD_WIDTHS, THUMBNAILS, thumbnail_name,
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GcMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    def setUp(self):
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.post = Post.objects.create(
+            author=self.user, text='Пост', image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        geometry, options = THUMBNAILS[CARD_FORMAT, CARD_WIDTHS[0]]
+        self.thumbnail = self.media_file(
+            thumbnail_name(self.post.image, geometry, options)
+        )
+        thumbnail = ImageFile(self.thumbnail, default.storage)
+        thumbnail.set_size((960, 339))
+        source = ImageFile(self.post.image)
+        source.set_size((2, 1))
+        default.kvstore.get_or_set(source)
+        default.kvstore.set(thumbnail, source)
+        self.orphans = [
+            self.media_file('posts/ab/replaced.gif'),
+            self.media_file('cache/ab/cd/old-size.jpg'),
+        ]
+
+    def media_file(self, name):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(SMALL_GIF)
+        return name
+
+    def gc(self, **options):
+        out = StringIO()
+        options.setdefault('min_age', 0)
+        call_command('gc_media', stdout=out, **options)
+        return out.getvalue()
+
+    def media(self):
+        return {
+            os.path.relpath(os.path.join(root, name), TEMP_MEDIA_ROOT)
+            for root, _, names in os.walk(TEMP_MEDIA_ROOT) for name in names
+        }
+
+    def test_removes_only_orphans(self):
+        kept = {self.post.image.name, self.thumbnail}
+        self.assertIn('Проверено файлов: 4, Убрано сирот: 2', self.gc())
+        self.assertEqual(self.media(), kept)
+
+    def test_dry_run_keeps_files(self):
+        self.assertIn('Нашлось бы сирот: 2', self.gc(dry_run=True))
+        self.assertEqual(len(self.media()), 4)
+
+    def test_quarantine_moves_orphans(self):
+        quarantine = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, quarantine)
+        self.gc(quarantine=quarantine)
+        for name in self.orphans:
+            with self.subTest(name=name):
+                self.assertTrue(
+                    os.path.exists(os.path.join(quarantine, name))
+                )
+                self.assertNotIn(name, self.media())
+
+    def test_fresh_files_kept(self):
+        """Файл загрузки, чей пост ещё не закоммичен, не трогается."""
+        self.assertIn('Убрано сирот: 0', self.gc(min_age=60))
+
+    def test_deleted_post_takes_thumbnails(self):
+        self.post.delete()
+        self.gc()
+        self.assertEqual(self.media(), set())
+
+    def test_thumbnails_of_orphans_go_to_quarantine(self):
+        """Миниатюры сироты считаются и уходят в карантин как оригинал."""
+        quarantine = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, quarantine)
+        self.post.delete()
+        self.assertIn('Убрано сирот: 4', self.gc(quarantine=quarantine))
+        self.assertTrue(
+            os.path.exists(os.path.join(quarantine, self.thumbnail))
+        )
+        self.assertIsNone(
+            default.kvstore.get(ImageFile(self.thumbnail, default.storage))
+        )
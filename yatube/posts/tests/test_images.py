@@ -0,0 +1,167 @@
+import multiprocessing
+import resource
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.images import bounded_image
+from posts.models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+ORIENTATION_TAG = 0x0112
+
+
+def image_upload(size, image_format='JPEG', name='photo.jpg', **options):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 10, 10)).save(
+        buffer, image_format, **options
+    )
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), f'image/{image_format.lower()}'
+    )
+
+
+def peak_memory(function, *args):
+    """Прирост пиковой памяти процесса на вызове, в КБ."""
+    def child(results):
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        function(*args)
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        results.put(after - before)
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    process = context.Process(target=child, args=(results,))
+    process.start()
+    peak = results.get()
+    process.join()
+    return peak
+
+
+def decode(upload):
+    upload.seek(0)
+    Image.open(upload).load()
+
+
+class ImageValidationTests(TestCase):
+    def form(self, upload):
+        return PostForm(data={'text': 'Пост'}, files={'image': upload})
+
+    @override_settings(IMAGE_MAX_BYTES=100)
+    def test_rejects_large_file(self):
+        form = self.form(image_upload((50, 50)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'file_too_large'
+        )
+
+    @override_settings(IMAGE_DECODE_PIXELS=1000)
+    def test_rejects_too_many_pixels(self):
+        form = self.form(image_upload((50, 50), 'PNG', 'image.png'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'too_many_pixels'
+        )
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_downsamples_large_original(self):
+        form = self.form(image_upload((400, 300)))
+        self.assertTrue(form.is_valid())
+        image = form.cleaned_data['image']
+        self.assertEqual(image.name, 'photo.jpg')
+        self.assertEqual(Image.open(image).size, (100, 75))
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_downsample_applies_exif_orientation(self):
+        """Снимок с телефона остаётся повёрнутым как надо."""
+        exif = Image.Exif()
+        exif[ORIENTATION_TAG] = 6
+        form = self.form(image_upload((400, 300), exif=exif))
+        self.assertTrue(form.is_valid())
+        image = Image.open(form.cleaned_data['image'])
+        self.assertEqual(image.size, (75, 100))
+        self.assertIsNone(image.getexif().get(ORIENTATION_TAG))
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_rejects_truncated_image(self):
+        """Обрезанный файл — ошибка формы, а не 500."""
+        upload = image_upload((400, 300))
+        upload = SimpleUploadedFile(
+            upload.name, upload.read()[:-200], upload.content_type
+        )
+        form = self.form(upload)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'broken_image'
+        )
+
+    def test_small_image_kept(self):
+        upload = image_upload((50, 50))
+        form = self.form(upload)
+        self.assertTrue(form.is_valid())
+        self.assertIs(form.cleaned_data['image'], upload)
+
+    def test_peak_memory_bounded(self):
+        """Большой JPEG проверяется без полного декодирования."""
+        upload = image_upload((6000, 4000))
+        full = peak_memory(decode, upload)
+        bounded = peak_memory(bounded_image, upload)
+        self.assertLess(bounded, full / 4)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def metadata(self, post):
+        post.refresh_from_db()
+        return (
+            post.image_width, post.image_height,
+            post.image_format, post.image_size,
+        )
+
+    def test_upload_fills_metadata(self):
+        """Данные картинки пишутся при сохранении загрузки."""
+        upload = image_upload((120, 80))
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=upload
+        )
+        self.assertEqual(
+            self.metadata(post), (120, 80, 'JPEG', upload.size)
+        )
+        post.image = None
+        post.save()
+        self.assertEqual(self.metadata(post), (None, None, '', None))
+
+    def test_backfill_reads_headers(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=image_upload((120, 80))
+        )
+        Post.objects.update(image_width=None, image_height=None)
+        missing = Post.objects.create(
+            author=self.user, text='Пост', image='posts/missing.jpg'
+        )
+        out, err = StringIO(), StringIO()
+        call_command(
+            'backfill_image_metadata', chunk_size=1, stdout=out, stderr=err
+        )
+        self.assertIn('Заполнено: 1, с ошибками: 1', out.getvalue())
+        self.assertIn(f'Пост {missing.id}', err.getvalue())
+        self.assertEqual(self.metadata(post)[:2], (120, 80))
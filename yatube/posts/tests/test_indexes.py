@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.management.commands.gc_media import orphan_originals
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+FEED_TABLES = ('posts_post', 'posts_comment', 'posts_timelineentry')
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        for i in range(15):
+            post = Post.objects.create(
+                author=cls.user, text='Тестовый пост', group=cls.group
+            )
+            Comment.objects.create(
+                post=post, author=cls.reader, text='Комментарий'
+            )
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def feed_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if 'ORDER BY' in sql and any(
+                f'FROM "{table}"' in sql for table in FEED_TABLES
+            ):
+                yield sql
+
+    def test_feed_queries_use_indexes_for_ordering(self):
+        """Ленты сортируются по индексу, без временного B-дерева."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            page_obj = self.authorized_client.get(url).context.get('page_obj')
+            if '?' not in url and page_obj and page_obj.next_cursor:
+                urls += (f'{url}?after={page_obj.next_cursor}',)
+        for url in urls:
+            for sql in self.feed_queries(url):
+                with self.subTest(url=url, sql=sql):
+                    with connection.cursor() as cursor:
+                        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                        plan = ' '.join(row[-1] for row in cursor.fetchall())
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_orphan_originals_use_image_index(self):
+        """Проверка сирот в gc_media не сканирует таблицу постов."""
+        with CaptureQueriesContext(connection) as queries:
+            orphan_originals(['posts/ab/first.jpg', 'posts/cd/second.jpg'])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'EXPLAIN QUERY PLAN ' + queries.captured_queries[0]['sql']
+            )
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('post_image_idx', plan)
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from posts.models import Group, Post
+from posts.models import Comment, Follow, Group, Post, Profile
 
 User = get_user_model()
 
@@ -59,3 +62,57 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            Profile.objects.values_list(
+                'posts_count', 'followers_count', 'following_count'
+            ).get(user=self.user),
+            (1, 1, 0)
+        )
+        self.assertEqual(Profile.objects.get(user=self.reader).following_count,
+                         1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(
+            Profile.objects.values_list(
+                'posts_count', 'followers_count', 'following_count'
+            ).get(user=self.user),
+            (1, 0, 0)
+        )
+
+    def test_recount_counters(self):
+        """Команда восстанавливает разошедшиеся счётчики."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Тестовый пост') for _ in range(3)
+        )
+        Follow.objects.create(user=self.reader, author=self.user)
+        Profile.objects.filter(user=self.user).delete()
+        Profile.objects.filter(user=self.reader).update(following_count=5)
+        call_command('recount_counters', chunk_size=1, stdout=StringIO())
+        self.assertEqual(
+            Profile.objects.values_list(
+                'posts_count', 'followers_count', 'following_count'
+            ).get(user=self.user),
+            (3, 1, 0)
+        )
+        self.assertEqual(Profile.objects.get(user=self.reader).following_count,
+                         1)
@@ -0,0 +1,109 @@
+import base64
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.admin import PostAdmin
+from posts.models import Post
+from posts.search import rebuild_index
+
+User = get_user_model()
+FIRST_PAGE_EXPECTED_POSTS = 10
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.once = Post.objects.create(
+            author=cls.user, text='Кошка спит на диване'
+        )
+        cls.twice = Post.objects.create(
+            author=cls.user, text='Кошка ловит кошку, кошка довольна'
+        )
+        Post.objects.create(author=cls.user, text='Собака гуляет')
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response.context['posts'], response.context['next_cursor']
+
+    def test_ranked_matches(self):
+        """Находит без учёта регистра, чаще встречающиеся — выше."""
+        posts, next_cursor = self.search('КОШКА')
+        self.assertEqual(posts, [self.twice, self.once])
+        self.assertIsNone(next_cursor)
+
+    def test_last_word_is_prefix(self):
+        self.assertEqual(self.search('спит дива')[0], [self.once])
+
+    def test_query_syntax_is_not_executed(self):
+        for query in ('"', 'кошка OR собака', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query}
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_index_follows_writes(self):
+        post = Post.objects.get(pk=self.once.pk)
+        post.text = 'Кот спит'
+        post.save()
+        self.assertEqual(self.search('диване')[0], [])
+        self.assertEqual(self.search('кот')[0], [post])
+        Post.objects.get(pk=self.twice.pk).delete()
+        self.assertEqual(self.search('кошка')[0], [])
+
+    def test_cursor_pages(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Кошка') for _ in range(12)
+        )
+        rebuild_index()
+        posts, next_cursor = self.search('кошка')
+        self.assertEqual(len(posts), FIRST_PAGE_EXPECTED_POSTS)
+        rest, last_cursor = self.search('кошка', after=next_cursor)
+        self.assertEqual(len(rest), 4)
+        self.assertIsNone(last_cursor)
+        self.assertFalse({post.id for post in posts} & {
+            post.id for post in rest
+        })
+
+    @override_settings(SEARCH_CANDIDATES=1)
+    def test_older_windows_are_reachable(self):
+        """Окна идут от новых совпадений к старым, ничего не теряется."""
+        self.assertEqual(self.search('кошка')[0], [self.twice, self.once])
+
+    @override_settings(SEARCH_CANDIDATES=3)
+    def test_cursor_pages_across_windows(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Кошка') for _ in range(12)
+        )
+        rebuild_index()
+        posts, next_cursor = self.search('кошка')
+        rest, last_cursor = self.search('кошка', after=next_cursor)
+        self.assertEqual(len(posts), FIRST_PAGE_EXPECTED_POSTS)
+        self.assertIsNone(last_cursor)
+        self.assertEqual(len(posts + rest), 14)
+        self.assertEqual(
+            {post.id for post in posts + rest},
+            set(Post.objects.exclude(
+                text='Собака гуляет'
+            ).values_list('id', flat=True)),
+        )
+
+    def test_out_of_range_cursor_returns_first_page(self):
+        for raw in (f'1.0|{2 ** 64}|0|', f'1.0|1|0|{2 ** 64}', '1.0|-1|0|'):
+            with self.subTest(raw=raw):
+                token = base64.urlsafe_b64encode(raw.encode()).decode()
+                posts, _ = self.search('кошка', after=token)
+                self.assertEqual(posts, [self.twice, self.once])
+
+    def test_admin_uses_index(self):
+        queryset, _ = PostAdmin(Post, admin.site).get_search_results(
+            None, Post.objects.all(), 'собака'
+        )
+        self.assertEqual([post.text for post in queryset], ['Собака гуляет'])
@@ -0,0 +1,253 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile, serialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from posts.management.commands.recount_counters import chunks
+from posts.models import Post
+from posts.thumbnails import (
+    THUMBNAILS, generate_thumbnails, ready_thumbnails, thumbnail_name,
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class ThumbnailLookupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text=f'Пост {number}',
+                image=f'posts/{number}.jpg',
+            )
+            for number in range(3)
+        ]
+        cls.ready = cls.posts[:2]
+        for post in cls.ready:
+            for (image_format, width), size in THUMBNAILS.items():
+                thumbnail = ImageFile(
+                    thumbnail_name(post.image, *size), default.storage
+                )
+                thumbnail.set_size((width, round(width * 339 / 960)))
+                KVStore.objects.create(
+                    key=add_prefix(thumbnail.key),
+                    value=serialize_image_file(thumbnail),
+                )
+
+    def setUp(self):
+        cache.clear()
+
+    def srcsets(self, pictures):
+        return {
+            post_id: picture['srcset'] for post_id, picture in pictures.items()
+        }
+
+    def test_page_resolved_with_one_query(self):
+        """Холодный кэш стоит одного запроса, тёплый — ни одного."""
+        posts = self.posts + [Post(author=self.user, text='Без картинки')]
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails = ready_thumbnails(posts)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(set(thumbnails), {post.id for post in self.ready})
+        with self.assertNumQueries(0):
+            cached = ready_thumbnails(posts)
+        self.assertEqual(self.srcsets(cached), self.srcsets(thumbnails))
+
+    @override_settings(THUMBNAIL_MISS_TIMEOUT=0)
+    def test_missing_variants_are_not_cached_for_long(self):
+        """Ненарисованные варианты перечитываются, готовые — нет."""
+        ready_thumbnails(self.posts)
+        with CaptureQueriesContext(connection) as queries:
+            ready_thumbnails(self.ready)
+        self.assertEqual(len(queries), 0)
+        with CaptureQueriesContext(connection) as queries:
+            ready_thumbnails(self.posts)
+        self.assertEqual(len(queries), 1)
+
+    def test_picture_lists_variants(self):
+        """Карточка отдаёт WebP и JPEG всех ширин с размерами кадра."""
+        post = self.ready[0]
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, 'width="960" height="339"')
+        for width in (320, 640, 960):
+            with self.subTest(width=width):
+                self.assertContains(response, f' {width}w', count=2)
+
+    def test_srcset_skips_upscaled_widths(self):
+        """Ширина оригинала из строки поста отсекает растянутые варианты."""
+        post = Post.objects.get(pk=self.ready[0].pk)
+        post.image_width = 700
+        srcset = ready_thumbnails([post])[post.id]['srcset']
+        self.assertIn(' 640w', srcset)
+        self.assertNotIn(' 960w', srcset)
+
+
+class BackfillThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = User.objects.create_user(username='TestUser')
+        cls.posts = [
+            Post.objects.create(
+                author=user, text=f'Пост {number}',
+                image=f'posts/{number}.jpg',
+            )
+            for number in range(3)
+        ]
+        Post.objects.create(author=user, text='Без картинки')
+
+    def test_counts_posts_with_images(self):
+        drawn = {self.posts[0].id: True, self.posts[1].id: False}
+
+        def generate(post_id):
+            if post_id not in drawn:
+                raise OSError('нет файла')
+            return drawn[post_id]
+
+        out, err = StringIO(), StringIO()
+        with mock.patch(
+            'posts.management.commands.backfill_thumbnails.'
+            'generate_thumbnails', side_effect=generate,
+        ):
+            call_command(
+                'backfill_thumbnails', chunk_size=2, concurrency=1,
+                stdout=out, stderr=err,
+            )
+        self.assertIn(
+            'Нарисовано: 1, уже готово: 1, с ошибками: 1', out.getvalue()
+        )
+        self.assertIn(f'Пост {self.posts[2].id}', err.getvalue())
+
+    def test_threads_take_one_chunk_at_a_time(self):
+        """Следующая порция id читается, когда готова текущая."""
+        drawn, ready_before_pull = [], []
+
+        def counted_chunks(queryset, size):
+            for ids in chunks(queryset, size):
+                yield ids
+                ready_before_pull.append(list(drawn))
+
+        def generate(post_id):
+            drawn.append(post_id)
+            return True
+
+        command = 'posts.management.commands.backfill_thumbnails.'
+        with mock.patch(
+            command + 'chunks', counted_chunks
+        ), mock.patch(command + 'generate_thumbnails', side_effect=generate):
+            call_command(
+                'backfill_thumbnails', chunk_size=1, concurrency=2,
+                stdout=StringIO(),
+            )
+        ids = [post.id for post in self.posts]
+        self.assertEqual(
+            ready_before_pull, [ids[:number] for number in range(1, 4)]
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self):
+        with mock.patch(
+            'django.db.transaction.on_commit', lambda callback: callback()
+        ), mock.patch('posts.signals.schedule_thumbnails') as schedule:
+            self.authorized_client.post(reverse('posts:post_create'), data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            })
+        post = Post.objects.get()
+        schedule.assert_called_once_with(post.id)
+        return post
+
+    def urls(self, post):
+        return [
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': post.id}),
+        ]
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Страница не рисует миниатюру, пока её не сделал фон."""
+        post = self.create_post()
+        for url in self.urls(post):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'bg-light')
+                self.assertNotContains(response, '<img class="card-img')
+
+    def test_identical_uploads_share_file(self):
+        """Повторная загрузка картинки ссылается на тот же файл."""
+        posts = [
+            Post.objects.create(
+                author=self.user, text='Пост', image=SimpleUploadedFile(
+                    name, SMALL_GIF, content_type='image/gif'
+                ),
+            )
+            for name in ('small.gif', 'copy.gif')
+        ]
+        self.assertEqual(posts[0].image.name, posts[1].image.name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(posts[0].image.path)),
+            [os.path.basename(posts[0].image.name)],
+        )
+
+    @skipUnless(
+        hasattr(Image, 'ANTIALIAS'), 'sorl-thumbnail 12.7 требует Pillow < 10'
+    )
+    def test_ready_thumbnail_replaces_placeholder(self):
+        post = self.create_post()
+        for url in self.urls(post):
+            self.authorized_client.get(url)
+        generate_thumbnails(post.id)
+        for url in self.urls(post):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, '<img class="card-img')
+                self.assertContains(response, 'type="image/webp"')
+                self.assertNotContains(response, 'bg-light')
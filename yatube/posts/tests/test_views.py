@@ -1,15 +1,38 @@
+import base64
+import warnings
+from unittest import mock
+
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+
+from core.cache import stampede
 
-from posts.models import Follow, Group, Post
+from posts.cache import get_feed_count
+from posts.feeds import HybridFeed
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+from posts.utils import CachedCountPaginator
 
 User = get_user_model()
 FIRST_PAGE_EXPECTED_POSTS = 10
 SECOND_PAGE_EXPECTED_POSTS = 3
 PAGES_TEST_POSTS_CREATE = 13
+COMMENTS_TEST_CREATE = 25
+FIRST_WINDOW_EXPECTED_COMMENTS = 20
+# На холодном кэше: группа и автор ищутся по slug и username.
+VIEW_QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_posts': 6,
+    'posts:profile': 7,
+    'posts:follow_index': 5,
+    'posts:post_detail': 4,
+}
 
 
 class PostPagesTests(TestCase):
@@ -29,6 +52,7 @@ class PostPagesTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -164,6 +188,9 @@ class PaginatorViewsTest(TestCase):
             )
         Post.objects.bulk_create(post_list)
 
+    def setUp(self):
+        cache.clear()
+
     def first_page_contains_records(self, url):
         response = self.client.get(url)
         self.assertEqual(len(response.context['page_obj']),
@@ -184,6 +211,51 @@ class PaginatorViewsTest(TestCase):
             self.first_page_contains_records(url=url)
             self.second_page_contains_records(url=url)
 
+    def test_cursor_pages(self):
+        """Курсор обходит ленту без пропусков и повторов."""
+        url = reverse('posts:index')
+        page_obj = self.client.get(url).context['page_obj']
+        seen = list(page_obj)
+        next_page = self.client.get(
+            url, {'after': page_obj.next_cursor}
+        ).context['page_obj']
+        self.assertTrue(next_page.cursor_mode)
+        self.assertFalse(next_page.has_next())
+        self.assertEqual(len(next_page), SECOND_PAGE_EXPECTED_POSTS)
+        seen += list(next_page)
+        self.assertEqual(
+            [post.id for post in seen],
+            list(Post.objects.values_list('id', flat=True))
+        )
+        previous_page = self.client.get(
+            url, {'before': next_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(page_obj))
+        self.assertFalse(previous_page.has_previous())
+
+    def test_cursor_page_is_stable(self):
+        """Новые посты не сдвигают страницы курсора."""
+        url = reverse('posts:index')
+        page_obj = self.client.get(url).context['page_obj']
+        Post.objects.create(author=self.user, text='Новый пост')
+        next_page = self.client.get(
+            url, {'after': page_obj.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(next_page), SECOND_PAGE_EXPECTED_POSTS)
+        self.assertNotIn(page_obj[-1], next_page)
+
+    def test_broken_cursor_returns_first_page(self):
+        overflow = base64.urlsafe_b64encode(
+            f'{timezone.now().isoformat()}|{2 ** 64}'.encode()
+        ).decode()
+        for token in ('!!', overflow):
+            with self.subTest(token=token):
+                response = self.client.get(
+                    reverse('posts:index'), {'after': token}
+                )
+                self.assertEqual(len(response.context['page_obj']),
+                                 FIRST_PAGE_EXPECTED_POSTS)
+
 
 class PostCreateTests(TestCase):
     @classmethod
@@ -207,6 +279,7 @@ class PostCreateTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -251,6 +324,7 @@ class FollowingTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -295,6 +369,207 @@ class FollowingTests(TestCase):
         self.assertIn(self.post, container2, 'поста нет в избранных')
 
 
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Старый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def timeline_posts(self):
+        return [entry.post for entry in self.user.timeline.all()]
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.timeline_posts(), [self.old_post])
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.timeline_posts(), [post, self.old_post])
+
+    def test_follow_index_reads_timeline(self):
+        """Лента подписок не соединяет подписки с таблицей постов."""
+        Follow.objects.create(user=self.user, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(
+                reverse('posts:follow_index')
+            )
+        self.assertEqual(list(response.context['page_obj']), [self.old_post])
+        self.assertFalse(any(
+            'posts_follow' in query['sql'] and 'posts_post' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    @override_settings(FEED_PULL_THRESHOLD=1)
+    def test_popular_author_is_pulled(self):
+        """Посты популярных авторов читаются и сливаются с лентой."""
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertFalse(self.user.timeline.exists())
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(self.user.timeline.exists())
+        with override_settings(FEED_PULL_THRESHOLD=2):
+            Follow.objects.create(user=self.user, author=other)
+            other_post = Post.objects.create(author=other, text='Пост')
+        self.assertEqual(self.timeline_posts(), [other_post])
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [other_post, post, self.old_post]
+        )
+
+    @override_settings(FEED_PULL_THRESHOLD=2)
+    def test_author_below_threshold_is_pushed_again(self):
+        """Посты, написанные, пока автор читался, не пропадают из ленты."""
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertNotIn(post, self.timeline_posts())
+        Follow.objects.filter(user=other).delete()
+        self.assertEqual(self.timeline_posts(), [post, self.old_post])
+
+    @override_settings(FEED_PULL_THRESHOLD=2)
+    def test_count_skips_timeline_entries_of_pulled_authors(self):
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        self.assertEqual(self.timeline_posts(), [self.old_post])
+        self.assertEqual(HybridFeed(self.user).count(), 1)
+
+    @override_settings(FEED_PULL_THRESHOLD=1)
+    def test_pulled_post_updates_follow_count(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        url = reverse('posts:follow_index')
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+        cls.reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def urls(self):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_posts': reverse(
+                'posts:group_posts', kwargs={'slug': self.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': self.user.username}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}
+            ),
+        }
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        return len(queries)
+
+    def add_content(self):
+        for i in range(FIRST_PAGE_EXPECTED_POSTS):
+            author = User.objects.create_user(username=f'Author{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'slug-{i}', description='-'
+            )
+            Post.objects.create(author=self.user, text='Пост', group=group)
+            Post.objects.create(author=author, text='Пост', group=group)
+            Comment.objects.create(
+                post=self.post, author=author, text='Комментарий'
+            )
+
+    def test_views_fit_query_budget(self):
+        """Число запросов не зависит от длины страницы."""
+        before = {name: self.count_queries(url)
+                  for name, url in self.urls().items()}
+        self.add_content()
+        for name, url in self.urls().items():
+            with self.subTest(view=name):
+                queries = self.count_queries(url)
+                self.assertEqual(queries, before[name])
+                self.assertLessEqual(queries, VIEW_QUERY_BUDGETS[name])
+
+
+class CommentWindowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COMMENTS_TEST_CREATE)
+        )
+
+    def test_detail_renders_first_window(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), FIRST_WINDOW_EXPECTED_COMMENTS)
+        self.assertTrue(comments.has_next())
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+
+    def test_fragment_returns_next_window(self):
+        """Фрагмент отдаёт следующее окно комментариев."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        first = self.client.get(url).context['comments']
+        response = self.client.get(url, {'after': first.next_cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий {i}' for i in range(
+                FIRST_WINDOW_EXPECTED_COMMENTS, COMMENTS_TEST_CREATE
+            )]
+        )
+        self.assertFalse(comments.has_next())
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_unordered_comments_do_not_warn(self):
+        """Окно берётся по курсору, порядок связи не нужен."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            self.client.get(url)
+
+
 class CacheTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -306,14 +581,323 @@ class CacheTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
     def test_index_page_cache(self):
+        """Фрагмент живёт, пока изменения идут в обход сигналов."""
         response = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.all().delete()
+        Post.objects.update(text='Изменённый текст')
         response_2 = self.authorized_client.get(reverse('posts:index'))
         cache.clear()
         response_3 = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, response_2.content)
         self.assertNotEqual(response_2.content, response_3.content)
+
+    def renders(self, requests):
+        """Сколько раз фрагменты ленты отрисовывались за запросы."""
+        with mock.patch(
+            'core.cache.stampede._recompute', wraps=stampede._recompute
+        ) as recompute:
+            for client, url in requests:
+                client.get(url)
+        return recompute.call_count
+
+    def test_viewers_do_not_evict_each_other(self):
+        """Зрители не перезаписывают друг другу фрагменты лент."""
+        reader = User.objects.create_user(username='Reader')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        for user in (self.user, reader):
+            Follow.objects.create(
+                user=user, author=User.objects.create_user(
+                    username=f'Author{user.id}'
+                ),
+            )
+        follow = reverse('posts:follow_index')
+        profile = reverse('posts:profile', kwargs={'username': self.user})
+        clients = [self.authorized_client, reader_client] * 3
+        self.assertEqual(
+            self.renders((client, follow) for client in clients), 2
+        )
+        self.assertEqual(
+            self.renders((client, profile) for client in clients), 1
+        )
+
+    def test_index_cache_follows_writes(self):
+        """Удаление поста сразу сбрасывает фрагмент главной."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+        Post.objects.all().delete()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, self.post.text)
+
+    def test_unrelated_write_keeps_fragment(self):
+        """Пост другого автора не сбрасывает ленту профиля."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.authorized_client.get(url)
+        Post.objects.update(text='Изменённый текст', modified=timezone.now())
+        other = User.objects.create_user(username='Other')
+        Post.objects.create(author=other, text='Чужой пост')
+        response = self.authorized_client.get(url)
+        self.assertContains(response, self.post.text)
+        self.assertNotContains(
+            self.authorized_client.get(reverse('posts:index')),
+            self.post.text
+        )
+
+
+class FeedCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text='Тестовый пост')
+            for _ in range(PAGES_TEST_POSTS_CREATE)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached_and_updated(self):
+        """Размер ленты берётся из кэша и меняется вместе с постами."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(get_feed_count('index'), PAGES_TEST_POSTS_CREATE)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(
+            any('COUNT' in query['sql'] for query in queries.captured_queries)
+        )
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(get_feed_count('index'), PAGES_TEST_POSTS_CREATE + 1)
+        post.delete()
+        self.assertEqual(get_feed_count('index'), PAGES_TEST_POSTS_CREATE)
+
+    @override_settings(PAGINATOR_ESTIMATE_PAGES=1)
+    def test_count_estimate_is_bounded(self):
+        """Без кэша первая страница не считает всю ленту."""
+        response = self.client.get(reverse('posts:index'))
+        paginator = response.context['page_obj'].paginator
+        self.assertTrue(paginator.count_is_estimate)
+        self.assertEqual(paginator.count, FIRST_PAGE_EXPECTED_POSTS + 1)
+        self.assertIsNone(get_feed_count('index'))
+        response = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertEqual(len(response.context['page_obj']),
+                         SECOND_PAGE_EXPECTED_POSTS)
+        self.assertEqual(get_feed_count('index'), PAGES_TEST_POSTS_CREATE)
+
+
+class PageWindowTests(TestCase):
+    def test_elided_page_range(self):
+        """Окно страниц не растёт вместе с лентой."""
+        paginator = CachedCountPaginator(range(50000 * 10), 10)
+        ellipsis = paginator.ELLIPSIS
+        cases = {
+            1: [1, 2, 3, ellipsis, 50000],
+            5: [1, ellipsis, 3, 4, 5, 6, 7, ellipsis, 50000],
+            49999: [1, ellipsis, 49997, 49998, 49999, 50000],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(paginator.get_elided_page_range(number)), expected
+                )
+
+    def test_short_range_is_not_elided(self):
+        paginator = CachedCountPaginator(range(30), 10)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(2)), [1, 2, 3]
+        )
+
+
+class PostFragmentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.group_url = reverse(
+            'posts:group_posts', kwargs={'slug': self.group.slug}
+        )
+
+    def test_feeds_share_post_fragments(self):
+        """Пост, отрисованный на главной, берётся из кэша в группе."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.update(text='Изменённый текст')
+        response = self.client.get(self.group_url)
+        self.assertContains(response, 'Тестовый пост')
+        self.assertTemplateNotUsed(response, 'posts/includes/post_list.html')
+
+    def test_post_changes_rerender_fragment(self):
+        """Правка поста, комментарий и переименование группы видны сразу."""
+        self.client.get(self.group_url)
+        self.post.text = 'Изменённый текст'
+        self.post.save()
+        self.assertContains(self.client.get(self.group_url), self.post.text)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        self.assertContains(
+            self.client.get(self.group_url), 'Комментариев: 1'
+        )
+        self.group.slug = 'new-slug'
+        self.group.save()
+        self.assertContains(
+            self.client.get(reverse('posts:index')), '/group/new-slug/'
+        )
+
+
+class IdentityCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, len(queries)
+
+    def test_missing_slug_is_cached(self):
+        """Повторный запрос несуществующей группы не идёт в базу."""
+        url = reverse('posts:group_posts', kwargs={'slug': 'missing'})
+        response, queries = self.get_queries(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(queries, 1)
+        response, queries = self.get_queries(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(queries, 0)
+        Group.objects.create(title='Новая', slug='missing', description='-')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_known_slug_skips_lookup(self):
+        url = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse(any(
+            'WHERE "posts_group"."slug"' in query['sql'] for query in queries
+        ))
+
+    def test_rename_drops_old_username(self):
+        old = reverse('posts:profile', kwargs={'username': 'TestUser'})
+        new = reverse('posts:profile', kwargs={'username': 'Renamed'})
+        self.assertEqual(self.client.get(old).status_code, 200)
+        self.assertEqual(self.client.get(new).status_code, 404)
+        self.user.username = 'Renamed'
+        self.user.save()
+        self.assertEqual(self.client.get(old).status_code, 404)
+        self.assertEqual(self.client.get(new).status_code, 200)
+        self.user.delete()
+        self.assertEqual(self.client.get(new).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def urls(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        ]
+
+    def revalidate(self, url):
+        etag = self.authorized_client.get(url)['ETag']
+        return self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_not_modified(self):
+        """Неизменившаяся страница отдаёт 304 без шаблонов."""
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    def test_validator_is_one_lookup(self):
+        """Кроме сессии и пользователя, 304 стоит одного запроса."""
+        for url in self.urls():
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertLessEqual(len(queries), 3)
+
+    def test_writes_change_etag(self):
+        """Записи в области страницы меняют её ETag."""
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        profile = reverse('posts:profile', kwargs={'username': self.user})
+        follow = reverse('posts:follow_index')
+        writes = {
+            detail: lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            ),
+            profile: lambda: Follow.objects.create(
+                user=self.reader, author=self.user
+            ),
+            follow: lambda: Post.objects.create(
+                author=self.user, text='Новый пост'
+            ),
+        }
+        for url, write in writes.items():
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                write()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_new_login_changes_form_page_etag(self):
+        """После повторного входа страница с формой отдаётся заново."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        etag = self.authorized_client.get(url)['ETag']
+        self.authorized_client.logout()
+        self.authorized_client.force_login(self.reader)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        url = reverse('posts:index')
+        etag = self.authorized_client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,64 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class WarmCachesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def warm(self, **options):
+        out = StringIO()
+        call_command(
+            'warm_caches', pages=2, groups=1, authors=1, thumbnails=0,
+            concurrency=1, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def test_pages_are_served_from_cache(self):
+        """После прогрева страницы не отрисовывают посты заново."""
+        self.assertIn('Прогрето: 4,', self.warm())
+        urls = {
+            'index_page': reverse('posts:index'),
+            'group_page': reverse(
+                'posts:group_posts', kwargs={'slug': self.group.slug}
+            ),
+            'profile_page': reverse(
+                'posts:profile', kwargs={'username': self.user}
+            ),
+        }
+        for name, url in urls.items():
+            with self.subTest(url=url):
+                self.assertIsNotNone(
+                    cache.get(make_template_fragment_key(name, [url]))
+                )
+                response = self.client.get(url)
+                self.assertContains(response, 'Тестовый пост')
+                self.assertTemplateNotUsed(
+                    response, 'posts/includes/post_list.html'
+                )
+
+    def test_time_budget_skips_tasks(self):
+        self.assertIn('пропущено по времени: 4', self.warm(time_budget=0))
@@ -0,0 +1,233 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from .feeds import bump_post_feeds
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Кадр карточки поста и ширины, в которых он рисуется для srcset.
+CARD_SIZE = (960, 339)
+CARD_WIDTHS = (960, 640, 320)
+# Запасной формат для <img> и форматы <source> по убыванию предпочтения.
+CARD_FORMAT = 'JPEG'
+SOURCE_FORMATS = ('WEBP',)
+MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+
+def card_geometry(width) -> str:
+    return f'{width}x{round(width * CARD_SIZE[1] / CARD_SIZE[0])}'
+
+
+# Варианты картинки поста: (формат, ширина) -> геометрия и опции sorl.
+THUMBNAILS = {
+    (image_format, width): (
+        card_geometry(width),
+        {'crop': 'center', 'upscale': True, 'format': image_format},
+    )
+    for image_format in (CARD_FORMAT,) + SOURCE_FORMATS
+    for width in CARD_WIDTHS
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def full_options(source, options) -> dict:
+    """Опции, дополненные как в get_thumbnail sorl."""
+    options = dict(options)
+    backend = default.backend
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_name(image, geometry, options) -> str:
+    """Имя миниатюры, под которым её сохранил бы get_thumbnail sorl."""
+    source = ImageFile(image)
+    return default.backend._get_thumbnail_filename(
+        source, geometry, full_options(source, options)
+    )
+
+
+def ready_variants(posts) -> dict:
+    """Готовые варианты картинок постов по id: get_many и один запрос.
+
+    Повторяет чтение cached_db-хранилища sorl, но сразу для всех
+    картинок; найденное в базе и отсутствие варианта кладёт в кэш.
+    Отсутствие живёт THUMBNAIL_MISS_TIMEOUT: вариант дорисует пул
+    другого процесса, а кэш по умолчанию у каждого процесса свой.
+    """
+    keys = {
+        add_prefix(ImageFile(
+            thumbnail_name(post.image, geometry, options), default.storage
+        ).key): (post.id, variant)
+        for post in posts if post.image
+        for variant, (geometry, options) in THUMBNAILS.items()
+    }
+    if not keys:
+        return {}
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(list(keys))
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(
+            KVStore.objects.filter(key__in=missing).values_list(
+                'key', 'value'
+            )
+        )
+        kv_cache.set_many(found, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        absent = {key: EMPTY_VALUE for key in missing if key not in found}
+        kv_cache.set_many(absent, settings.THUMBNAIL_MISS_TIMEOUT)
+        values.update(found)
+        values.update(absent)
+    variants = {}
+    for key, value in values.items():
+        if value != EMPTY_VALUE:
+            post_id, variant = keys[key]
+            variants.setdefault(post_id, {})[variant] = (
+                deserialize_image_file(value)
+            )
+    return variants
+
+
+def srcset(variants, image_format, widths) -> str:
+    return ', '.join(
+        f'{variants[image_format, width].url} {width}w'
+        for width in widths if (image_format, width) in variants
+    )
+
+
+def srcset_widths(image_width) -> tuple:
+    """Ширины для srcset без растянутых вариантов шире оригинала.
+
+    Ширина оригинала берётся из строки поста; самая узкая остаётся всегда.
+    """
+    if not image_width:
+        return CARD_WIDTHS
+    return tuple(
+        width for width in CARD_WIDTHS
+        if width <= image_width or width == CARD_WIDTHS[-1]
+    )
+
+
+def picture(variants, image_width=None):
+    """Данные для <picture>: запасной <img> и <source> других форматов.
+
+    Без запасного варианта в полный размер картинка ещё не готова.
+    """
+    img = variants.get((CARD_FORMAT, CARD_WIDTHS[0]))
+    if img is None:
+        return None
+    widths = srcset_widths(image_width)
+    return {
+        'img': img,
+        'srcset': srcset(variants, CARD_FORMAT, widths),
+        'sources': [
+            {'type': MIME_TYPES[image_format],
+             'srcset': srcset(variants, image_format, widths)}
+            for image_format in SOURCE_FORMATS
+            if (image_format, CARD_WIDTHS[0]) in variants
+        ],
+    }
+
+
+def ready_thumbnails(posts) -> dict:
+    """Готовые картинки страницы постов по id для шаблона thumbnail."""
+    variants = ready_variants(posts)
+    pictures = {
+        post.id: picture(variants[post.id], post.image_width)
+        for post in posts if post.id in variants
+    }
+    return {
+        post_id: value for post_id, value in pictures.items() if value
+    }
+
+
+def draw_thumbnails(image, sizes):
+    """Рисует размеры из одного декодирования исходника.
+
+    Делает то же, что get_thumbnail sorl для каждого размера, но
+    исходник открывается и декодируется один раз на все варианты.
+    """
+    source = ImageFile(image)
+    engine = default.engine
+    source_image = engine.get_image(source)
+    try:
+        image_info = engine.get_image_info(source_image)
+        source.set_size(engine.get_image_size(source_image))
+        for geometry, options in sizes:
+            options = full_options(source, options)
+            thumbnail = ImageFile(
+                default.backend._get_thumbnail_filename(
+                    source, geometry, options
+                ),
+                default.storage,
+            )
+            default.backend._create_thumbnail(
+                source_image, geometry, dict(options, image_info=image_info),
+                thumbnail,
+            )
+            default.kvstore.get_or_set(source)
+            default.kvstore.set(thumbnail, source)
+    finally:
+        engine.cleanup(source_image)
+
+
+def generate_thumbnails(post_id) -> bool:
+    """Рисует недостающие варианты картинки поста и сбрасывает разметку.
+
+    Возвращает True, если что-то было нарисовано.
+    """
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return False
+    ready = ready_variants([post]).get(post.id, {})
+    pending = [
+        size for variant, size in THUMBNAILS.items() if variant not in ready
+    ]
+    if not pending:
+        return False
+    draw_thumbnails(post.image, pending)
+    Post.objects.filter(pk=post_id).update(modified=timezone.now())
+    bump_post_feeds(post_id)
+    return True
+
+
+def _run(post_id):
+    try:
+        generate_thumbnails(post_id)
+    except Exception:
+        logger.exception('Не удалось нарисовать миниатюры поста %s', post_id)
+    finally:
+        connection.close()
+
+
+def schedule_thumbnails(post_id):
+    """Ставит отрисовку миниатюр в фоновый пул потоков."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    _executor.submit(_run, post_id)
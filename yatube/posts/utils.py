@@ -1,12 +1,246 @@
+import base64
+import binascii
+from functools import partial
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .cache import (
+    MISSING, get_feed_count, get_identity, set_feed_count, set_identity,
+)
+
+FEED_KEY = ('pub_date', 'id')
+# Наибольший id, который SQLite хранит в INTEGER.
+MAX_ID = 2 ** 63 - 1
+
+
+def get_id_or_404(model, field, value) -> int:
+    """id объекта по уникальному полю через кэш, в том числе промахов."""
+    pk = get_identity(model, field, value)
+    if pk is None:
+        pk = model.objects.filter(**{field: value}).values_list(
+            'pk', flat=True
+        ).first()
+        set_identity(model, field, value, pk)
+    if pk is None or pk == MISSING:
+        raise Http404(f'{model._meta.object_name} {value} не найден')
+    return pk
+
+
+def encode_cursor(obj, key=FEED_KEY) -> str:
+    """Упаковывает ключ (pub_date, id) объекта в непрозрачный токен."""
+    first, second = key
+    raw = f'{getattr(obj, first).isoformat()}|{getattr(obj, second)}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, id) из токена или None, если токен битый."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, pk = raw.decode().rsplit('|', 1)
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None or not 0 < pk <= MAX_ID:
+        return None
+    return value, pk
+
+
+def keyset_slice(
+        queryset,
+        cursor=None,
+        backwards=False,
+        limit: int = settings.POSTS_ON_PAGE,
+        key=FEED_KEY,
+        descending: bool = True,
+) -> list:
+    """Строки ленты за курсором в порядке обхода, без OFFSET."""
+    first, second = key
+    toward_end = descending != backwards
+    if cursor is not None:
+        value, pk = cursor
+        lookup = 'lt' if toward_end else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{first}__{lookup}': value})
+            | Q(**{first: value, f'{second}__{lookup}': pk})
+        )
+    prefix = '-' if toward_end else ''
+    return list(
+        queryset.order_by(f'{prefix}{first}', f'{prefix}{second}')[:limit]
+    )
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по курсору: каждая страница стоит одного запроса.
+
+    Номер страницы и число страниц описывают только соседей текущей
+    страницы, поэтому has_next/has_previous у обычного Page работают.
+    """
+
+    def __init__(self, object_list, per_page, key=FEED_KEY, descending=True):
+        super().__init__(object_list, per_page)
+        self.key = key
+        self.descending = descending
+        self._count = 0
+        self._num_pages = 1
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def _check_object_list_is_ordered(self):
+        """Порядок задаёт keyset_slice по key, исходный не важен."""
+
+    def get_cursor_page(self, after=None, before=None) -> Page:
+        cursor = decode_cursor(before or after or '')
+        backwards = bool(before) and cursor is not None
+        fetch = getattr(self.object_list, 'keyset_slice', None)
+        if fetch is None:
+            fetch = partial(keyset_slice, self.object_list)
+        rows = fetch(
+            cursor,
+            backwards,
+            self.per_page + 1,
+            self.key,
+            self.descending,
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = cursor is not None, has_more
+        number = 2 if has_previous else 1
+        self._count = len(rows)
+        self._num_pages = number + 1 if has_next else number
+        page = self._get_page(rows, number, self)
+        page.cursor_mode = True
+        set_cursors(page, self.key)
+        return page
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, который берёт размер ленты из кэша.
+
+    Без закэшированного значения считает не дальше
+    PAGINATOR_ESTIMATE_PAGES страниц и отдаёт оценку «не меньше».
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, scope=None, number=None):
+        super().__init__(object_list, per_page)
+        self.scope = scope
+        self.requested_number = number
+        self.count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        if self.scope is None:
+            return super().count
+        count = get_feed_count(self.scope)
+        if count is not None:
+            return count
+        limit = self.per_page * settings.PAGINATOR_ESTIMATE_PAGES
+        if (
+            not isinstance(self.object_list, QuerySet)
+            or self._requested_beyond(limit)
+        ):
+            count = super().count
+        else:
+            count = self.object_list[:limit + 1].count()
+            if count > limit:
+                self.count_is_estimate = True
+                return count
+        set_feed_count(self.scope, count)
+        return count
+
+    def get_elided_page_range(
+            self,
+            number=1,
+            on_each_side: int = 2,
+            on_ends: int = 1,
+    ):
+        """Номера страниц: края и окрестность текущей, между ними «…»."""
+        number = self.validate_number(number)
+        num_pages = self.num_pages
+        if num_pages <= (on_each_side + on_ends) * 2 + 1:
+            yield from self.page_range
+            if self.count_is_estimate:
+                yield self.ELLIPSIS
+            return
+        if number > on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if self.count_is_estimate:
+            yield from range(
+                number + 1, min(number + on_each_side, num_pages) + 1
+            )
+            yield self.ELLIPSIS
+        elif number < num_pages - on_each_side - on_ends:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            yield from range(number + 1, num_pages + 1)
+
+    def _requested_beyond(self, limit):
+        try:
+            number = int(self.requested_number)
+        except (TypeError, ValueError):
+            return False
+        return (number - 1) * self.per_page >= limit
+
+
+def set_cursors(page, key=FEED_KEY) -> Page:
+    """Добавляет странице токены соседних страниц."""
+    page.object_list = list(page.object_list)
+    page.next_cursor = page.previous_cursor = None
+    if page.object_list and page.has_next():
+        page.next_cursor = encode_cursor(page.object_list[-1], key)
+    if page.object_list and page.has_previous():
+        page.previous_cursor = encode_cursor(page.object_list[0], key)
+    return page
 
 
 def get_page(
         request,
         queryset,
-        quantity: int = settings.POSTS_ON_PAGE
-) -> Paginator:
-    paginator = Paginator(queryset, quantity)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+        quantity: int = settings.POSTS_ON_PAGE,
+        scope: str = None,
+) -> Page:
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        paginator = CursorPaginator(queryset, quantity)
+        return paginator.get_cursor_page(after, before)
+    number = request.GET.get('page')
+    paginator = CachedCountPaginator(queryset, quantity, scope, number)
+    page = paginator.get_page(number)
+    page.cursor_mode = False
+    page.page_window = list(paginator.get_elided_page_range(page.number))
+    return set_cursors(page)
+
+
+def get_comments_page(
+        comments,
+        after=None,
+        quantity: int = settings.COMMENTS_ON_PAGE,
+) -> Page:
+    """Окно комментариев по возрастанию (pub_date, id) после курсора."""
+    paginator = CursorPaginator(comments, quantity, descending=False)
+    return paginator.get_cursor_page(after)
@@ -1,38 +1,118 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition
 
+from .autocomplete import INDEXES
+from .cache import get_feed_version
+from .feeds import HybridFeed
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post
-from .utils import get_page
+from .search import search_posts
+from .thumbnails import ready_thumbnails
+from .utils import get_comments_page, get_id_or_404, get_page
 
 User = get_user_model()
 
 
+def feed_etag(scopes, csrf=False):
+    """ETag страницы из поколений её областей и id пользователя.
+
+    scopes(request, **kwargs) возвращает области страницы; найденные
+    по пути объекты или их id он кладёт в request, чтобы представление
+    не искало их повторно. Версия остаётся в request.feed_version.
+    Для страниц с формой (csrf=True) в ETag входит хэш секрета CSRF:
+    после нового входа закэшированная форма не пройдёт проверку.
+    """
+    def etag(request, *args, **kwargs):
+        request.feed_version = get_feed_version(
+            scopes(request, *args, **kwargs)
+        )
+        tag = f'{request.user.id}-{request.feed_version}'
+        if csrf:
+            get_token(request)
+            secret = request.META['CSRF_COOKIE'].encode()
+            tag += '-' + hashlib.sha256(secret).hexdigest()[:16]
+        return tag
+    return etag
+
+
+def index_scopes(request):
+    return ['catalog', 'index']
+
+
+def group_scopes(request, slug):
+    request.group_id = get_id_or_404(Group, 'slug', slug)
+    return ['catalog', f'group:{request.group_id}']
+
+
+def profile_scopes(request, username):
+    request.author_id = get_id_or_404(User, 'username', username)
+    scopes = [
+        'catalog',
+        f'author:{request.author_id}',
+        f'profile:{request.author_id}',
+    ]
+    if request.user.is_authenticated:
+        scopes.append(f'follow:{request.user.id}')
+    return scopes
+
+
+def detail_scopes(request, post_id):
+    request.post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'),
+        id=post_id
+    )
+    return [
+        'catalog',
+        f'post:{request.post.id}',
+        f'author:{request.post.author_id}',
+    ]
+
+
+def follow_index_scopes(request):
+    request.feed = HybridFeed(request.user)
+    return ['catalog', f'follow:{request.user.id}'] + [
+        f'author:{author_id}' for author_id in request.feed.pulled_authors
+    ]
+
+
+@condition(etag_func=feed_etag(index_scopes))
 def index(request):
-    posts = Post.objects.all()
-    page_obj = get_page(request, posts)
+    posts = Post.objects.select_related('author', 'group')
+    page_obj = get_page(request, posts, scope='index')
     context = {
         'page_obj': page_obj,
+        'feed_version': request.feed_version,
     }
     return render(request, 'posts/index.html', context)
 
 
+@condition(etag_func=feed_etag(group_scopes))
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = get_page(request, posts)
+    group = get_object_or_404(Group, pk=request.group_id)
+    posts = group.posts.select_related('author', 'group')
+    page_obj = get_page(request, posts, scope=f'group:{group.id}')
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_version': request.feed_version,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(etag_func=feed_etag(profile_scopes))
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = get_page(request, posts)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), pk=request.author_id
+    )
+    posts = author.posts.select_related('author', 'group')
+    page_obj = get_page(request, posts, scope=f'author:{author.id}')
     following = request.user.is_authenticated and Follow.objects.filter(
         author=author,
         user=request.user
@@ -41,22 +121,69 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        # Подписки зрителя меняют только шапку и ETag, но не посты.
+        'feed_version': get_feed_version(
+            ['catalog', f'author:{author.id}']
+        ),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@condition(etag_func=feed_etag(detail_scopes, csrf=True))
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = request.post
+    comments = get_comments_page(post.comments.select_related('author'))
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
+        'post_id': post.id,
+        'thumbnail': ready_thumbnails([post]).get(post.id),
         'form': form,
         'comments': comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    results = search_posts(
+        query,
+        Post.objects.select_related('author', 'group'),
+        after=request.GET.get('after'),
+    )
+    context = {
+        'query': query,
+        'posts': results.posts,
+        'next_cursor': results.next_cursor,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def autocomplete(request, kind):
+    index = INDEXES.get(kind)
+    if index is None:
+        raise Http404(f'Нет автодополнения {kind}')
+    found = index.search(
+        request.GET.get('q', '').strip(), settings.AUTOCOMPLETE_LIMIT
+    )
+    return JsonResponse(
+        {'results': [{'id': pk, 'text': label} for pk, label in found]}
+    )
+
+
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = get_comments_page(
+        post.comments.select_related('author'),
+        after=request.GET.get('after'),
+    )
+    context = {
+        'post_id': post.id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -105,29 +232,36 @@ def add_comment(request, post_id):
 
 
 @login_required
+@condition(etag_func=feed_etag(follow_index_scopes))
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page(request, posts)
+    # Посты читаемых авторов не сбрасывают счётчик подписчиков; версия
+    # ленты в ключе меняется с поколениями этих авторов.
+    page_obj = get_page(
+        request,
+        request.feed,
+        scope=f'follow:{request.user.id}:{request.feed_version}',
+    )
     context = {
         'page_obj': page_obj,
+        'feed_version': request.feed_version,
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author_id = get_id_or_404(User, 'username', username)
     if (
-        Follow.objects.filter(author=author, user=request.user).exists()
-        or request.user == author
+        Follow.objects.filter(author_id=author_id, user=request.user).exists()
+        or request.user.id == author_id
     ):
         return redirect('posts:profile', username=username)
-    Follow.objects.create(user=request.user, author=author)
+    Follow.objects.create(user=request.user, author_id=author_id)
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    author_id = get_id_or_404(User, 'username', username)
+    Follow.objects.filter(user=request.user, author_id=author_id).delete()
     return redirect('posts:profile', username)
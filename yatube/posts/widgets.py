@@ -0,0 +1,33 @@
+from django import forms
+from django.urls import reverse
+
+
+class AutocompleteSelect(forms.Select):
+    """Select, в котором отрисован только выбранный вариант.
+
+    Остальные варианты подставляет скрипт страницы из ответа
+    posts:autocomplete, поэтому форма не читает всю таблицу.
+    """
+
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocomplete'] = reverse(
+            'posts:autocomplete', kwargs={'kind': self.kind}
+        )
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        iterator = self.choices
+        selected = [pk for pk in value if str(pk).isdigit()]
+        objects = iterator.queryset.filter(pk__in=selected) if selected else []
+        empty_label = iterator.field.empty_label
+        self.choices = [('', empty_label)] if empty_label is not None else []
+        self.choices += [iterator.choice(obj) for obj in objects]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterator
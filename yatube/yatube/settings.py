@@ -110,15 +110,52 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+PAGINATOR_ESTIMATE_PAGES = 10
+FEED_COUNT_TIMEOUT = 60 * 60
+POST_FRAGMENT_TIMEOUT = 24 * 60 * 60
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+IDENTITY_TIMEOUT = 24 * 60 * 60
+IDENTITY_MISS_TIMEOUT = 60
+
+TIMELINE_BACKFILL_LIMIT = 1000
+TIMELINE_BATCH_SIZE = 500
+FEED_PULL_THRESHOLD = 10000
+
+THUMBNAIL_WORKERS = 2
+# Сколько помнить, что миниатюра ещё не нарисована.
+THUMBNAIL_MISS_TIMEOUT = 30
+
+# Загрузки картинок: JPEG декодируется уменьшенным, остальное целиком.
+IMAGE_MAX_BYTES = 10 * 2 ** 20
+IMAGE_MAX_PIXELS = 50_000_000
+IMAGE_DECODE_PIXELS = 16_000_000
+IMAGE_MAX_SIDE = 1280
+
+# Поиск ранжирует по bm25 окнами по столько совпадений, от новых к старым.
+SEARCH_CANDIDATES = 1000
+
+# Индекс автодополнения живёт в памяти процесса и пересобирается целиком.
+AUTOCOMPLETE_REFRESH = 5 * 60
+AUTOCOMPLETE_LIMIT = 10
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш общий для всех процессов: поколения лент сбрасывают фрагменты
+# только там, где их видно, поэтому кэш процесса отдавал бы старое.
+CACHE_PATH = os.environ.get(
+    'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')
+)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': CACHE_PATH,
+        'OPTIONS': {
+            'MAX_BYTES': 256 * 1024 * 1024,
+        },
     }
 }
 